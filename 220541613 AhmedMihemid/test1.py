@@ -1,11 +1,26 @@
 import asyncio
 import logging
+import logging.handlers
+import queue
 import json
 import hashlib
 import os
-from datetime import datetime, timedelta, timezone
-from pathlib import Path
 import random
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from collections import OrderedDict, defaultdict
+
+# orjson ve numpy isteğe bağlı: kuruluysa kullanılır, değilse standart kütüphane
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # LOG KONFİGÜRASYONU
 
@@ -16,18 +31,43 @@ log_dir.mkdir(exist_ok=True)
 timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
 log_file = log_dir / f"simulation_log_{timestamp_str}.log"
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file, encoding="utf-8"),
-        logging.StreamHandler()
-    ]
-)
+# Dosya/konsol yazımı ayrı bir thread'de yapılır; event loop disk I/O'su
+# yüzünden bloklanmaz.
+log_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+file_handler = logging.FileHandler(log_file, encoding="utf-8")
+file_handler.setFormatter(log_formatter)
+stream_handler = logging.StreamHandler()
+stream_handler.setFormatter(log_formatter)
+
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+
+queue_handler = logging.handlers.QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter("%(message)s"))
+
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
 
 logger = logging.getLogger("Simulator")
 
 
+def write_report(report_path, data):
+    """ Raporu diske yazar (event loop dışında, thread'de çağrılır).
+    Olay zamanları ISO metnine burada, toplu olarak çevrilir. """
+    data["events"] = [
+        {"timestamp": ns_to_iso(ts), "energy": energy, "status": status}
+        for ts, energy, status in data["events"]
+    ]
+    if orjson is not None:
+        report_path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        report_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def ns_to_iso(ts_ns):
+    """ Epoch nanosaniyeyi rapor/log için ISO metnine çevirir. """
+    return datetime.fromtimestamp(ts_ns / 1e9, timezone.utc).isoformat()
+
+
 # GÜVENLİK MONİTÖRÜ
 
 class SecurityMonitor:
@@ -38,7 +78,8 @@ class SecurityMonitor:
         self.total_attacks = 0
 
     def record(self, ts, energy, status):
-        self.events.append({"timestamp": ts, "energy": energy, "status": status})
+        # Sıcak yolda sadece ham değerler saklanır; ISO çevrimi rapor yazılırken
+        self.events.append((ts, energy, status))
 
     def log_attack(self, attack_type, reason, blocked=True):
         self.total_attacks += 1
@@ -53,53 +94,75 @@ class SecurityMonitor:
         }
 
         self.attacks.append(entry)
-        logger.warning(f"[UYARI] {attack_type} | Engellendi = {blocked} | Sebep: {reason}")
+        logger.warning("[UYARI] %s | Engellendi = %s | Sebep: %s", attack_type, blocked, reason)
 
-    def save_report(self):
+    async def save_report(self):
         report_path = log_dir / f"security_report_{timestamp_str}.json"
 
         data = {
-            "events": self.events,
+            "events": list(self.events),
             "attacks": self.attacks,
             "total_attacks": self.total_attacks,
             "blocked": self.blocked
         }
 
-        with open(report_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
+        await asyncio.to_thread(write_report, report_path, data)
 
-        logger.info(f"Güvenlik raporu kaydedildi: {report_path}")
+        logger.info("Güvenlik raporu kaydedildi: %s", report_path)
 
 
 #  ŞARJ İSTASYONU 
 
 class ChargingStation:
-    def __init__(self, station_id):
+    # Önceden üretilen rastgele artış sapması sayısı
+    RNG_BUF_SIZE = 4096
+
+    def __init__(self, station_id, seed=None):
         self.id = station_id
         self.energy = 1000.0
-        self.start_time = datetime.now(timezone.utc)
+        # Enerji artışı sapmaları (-1, 1) toplu üretilir, her pakette sıradaki okunur
+        self._rng = np.random.default_rng(seed) if np is not None else random.Random(seed)
+        self._refill_rng()
+        self.start_ns = time.time_ns()
+        # Paket imzası için istasyona özel MAC anahtarı. Anahtarlı BLAKE2b
+        # durumu bir kez hazırlanır, her pakette sadece kopyalanır.
+        self._mac = hashlib.blake2b(key=os.urandom(32), digest_size=16)
+        # İmza girdisinin sabit kısmı: istasyon kimliği
+        self._sig_prefix = f"{self.id}|".encode()
+
+    def _refill_rng(self):
+        if np is not None:
+            self._rng_buf = self._rng.uniform(-1, 1, size=self.RNG_BUF_SIZE).tolist()
+        else:
+            uniform = self._rng.uniform
+            self._rng_buf = [uniform(-1, 1) for _ in range(self.RNG_BUF_SIZE)]
+        self._rng_i = 0
 
     def generate_packet(self, elapsed_seconds):
         # Gerçekçi enerji artışı: 9 ila 11 Wh
-        increment = 10 + random.uniform(-1, 1)
+        if self._rng_i == self.RNG_BUF_SIZE:
+            self._refill_rng()
+        increment = 10 + self._rng_buf[self._rng_i]
+        self._rng_i += 1
         self.energy += increment
 
-        ts = self.start_time + timedelta(seconds=elapsed_seconds)
+        ts_ns = self.start_ns + elapsed_seconds * 1_000_000_000
+        energy = round(self.energy, 2)
+        nonce = os.urandom(4)
+
+        # Paket imzası: stationId|ts_ns|energyWh|nonce(4 ham byte),
+        # JSON'a çevirmeden sabit biçimde birleştirilir
+        mac = self._mac.copy()
+        mac.update(b"%b%d|%r|%b" % (self._sig_prefix, ts_ns, energy, nonce))
 
-        packet = {
+        return {
             "stationId": self.id,
-            "energyWh": round(self.energy, 2),
-            "timestamp": ts.isoformat(),
-            "nonce": hashlib.sha256(os.urandom(8)).hexdigest()[:8]
+            "energyWh": energy,
+            "ts_ns": ts_ns,
+            "nonce": nonce.hex(),
+            "signature": mac.hexdigest()
         }
 
-        # Paket imzası
-        packet["signature"] = hashlib.sha256(
-            json.dumps(packet, sort_keys=True).encode()
-        ).hexdigest()
-
-        return packet
-
 
 # SALDIRGAN
 
@@ -122,7 +185,7 @@ class Attacker:
             return None
         logger.info("[SALDIRGAN] ZAMAN DAMGASI MANİPÜLASYON paketi gönderiliyor...")
         pkt = self.stolen.copy()
-        pkt["timestamp"] = datetime.now(timezone.utc).isoformat()
+        pkt["ts_ns"] = time.time_ns()
         return pkt
 
 
@@ -130,41 +193,66 @@ class Attacker:
 
 
 class CSMS:
+    # Görülen (istasyon, nonce) kayıtları için üst sınır (LRU)
+    SEEN_CAP = 1_000_000
+    # Tek bir istasyonun LRU içinde tutabileceği en fazla kayıt; dolunca o
+    # istasyonun en eski nonce'u düşer (diğer istasyonlarınkiler korunur)
+    PER_KEY_CAP = 100_000
+
     def __init__(self, monitor):
         self.monitor = monitor
         self.last_energy = 0
-        self.last_timestamp = datetime.min.replace(tzinfo=timezone.utc)
-        self.seen_signatures = set()
+        self.last_ts_ns = 0
+        self.seen = OrderedDict()
+        # istasyon -> o istasyonun nonce'ları (istasyon başına LRU sırası)
+        self.seen_per_station = defaultdict(OrderedDict)
+
+    def _remember(self, key):
+        station, nonce = key
+        station_seen = self.seen_per_station[station]
+        self.seen[key] = None
+        station_seen[nonce] = None
+        if len(station_seen) > self.PER_KEY_CAP:
+            old_nonce, _ = station_seen.popitem(last=False)
+            del self.seen[(station, old_nonce)]
+        if len(self.seen) > self.SEEN_CAP:
+            (old_station, old_nonce), _ = self.seen.popitem(last=False)
+            old_seen = self.seen_per_station[old_station]
+            del old_seen[old_nonce]
+            if not old_seen:
+                del self.seen_per_station[old_station]
 
     def process(self, packet):
-        ts = datetime.fromisoformat(packet["timestamp"])
+        ts = packet["ts_ns"]
         energy = packet["energyWh"]
-        sig = packet["signature"]
-
-        # --- KURAL 1: Tekrar imza tespiti ---
-        if sig in self.seen_signatures:
-            self.monitor.log_attack("Tekrar Saldırısı", "İmza tekrar kullanıldı")
-            self.monitor.record(packet["timestamp"], energy, "REDDEDİLDİ")
+        key = (packet["stationId"], packet["nonce"])
+
+        # --- KURAL 1: Tekrar (station, nonce) tespiti ---
+        if key in self.seen:
+            self.seen.move_to_end(key)
+            self.seen_per_station[key[0]].move_to_end(key[1])
+            self.monitor.log_attack("Tekrar Saldırısı", "Nonce tekrar kullanıldı")
+            self.monitor.record(ts, energy, "REDDEDİLDİ")
             return False
 
         # --- KURAL 2: zaman ileri gitmeli ---
-        if ts <= self.last_timestamp:
+        if ts <= self.last_ts_ns:
             self.monitor.log_attack("Zaman Damgası Saldırısı", "Zaman artmıyor")
-            self.monitor.record(packet["timestamp"], energy, "REDDEDİLDİ")
+            self.monitor.record(ts, energy, "REDDEDİLDİ")
             return False
 
         # --- KURAL 3: enerji mantıklı olmalı (azalamaz) ---
         if energy < self.last_energy:
             self.monitor.log_attack("Manipülasyon Saldırısı", "Enerji yasadışı şekilde azaldı")
-            self.monitor.record(packet["timestamp"], energy, "REDDEDİLDİ")
+            self.monitor.record(ts, energy, "REDDEDİLDİ")
             return False
 
         # Kabul
-        logger.info(f"[CSMS] KABUL EDİLDİ: {energy}Wh")
-        self.seen_signatures.add(sig)
+        logger.info("[CSMS] KABUL EDİLDİ: %sWh", energy)
+        self._remember(key)
         self.last_energy = energy
-        self.last_timestamp = ts
-        self.monitor.record(packet["timestamp"], energy, "KABUL EDİLDİ")
+        self.last_ts_ns = ts
+        self.monitor.record(ts, energy, "KABUL EDİLDİ")
         return True
 
 
@@ -206,7 +294,7 @@ async def run_simulation():
             pkt = station.generate_packet(tick * 10)
             csms.process(pkt)
 
-    monitor.save_report()
+    await monitor.save_report()
     logger.info("=== SIMÜLASYON TAMAMLANDI ===")
 
 
@@ -214,7 +302,17 @@ async def run_simulation():
 
 
 if __name__ == "__main__":
+    # uvloop kuruluysa libuv tabanlı event loop kullan (yoksa varsayılan loop)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
+    log_listener.start()
     try:
         asyncio.run(run_simulation())
     except KeyboardInterrupt:
         print("Durduruldu.")
+    finally:
+        log_listener.stop()
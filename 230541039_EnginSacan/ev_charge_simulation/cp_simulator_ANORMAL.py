@@ -1,26 +1,57 @@
 import asyncio
 import can
 import logging
+import signal
+import struct
 import websockets  # <-- Yeni eklendi
 from ocpp.v16 import ChargePoint as cp
 from ocpp.v16 import call
-from datetime import datetime
+from iso_time import iso_now
 
 logging.basicConfig(level=logging.INFO)
 
+# 0x300 mesajındaki 4 byte'lık little-endian enerji değeri (kWh * 10)
+U32LE = struct.Struct("<I")
+
 # Global değişken: CSMS'e bağlı CP nesnesini tutmak için
 connected_charge_point = None
 
+# Tek bir MeterValues mesajında birleştirilecek en fazla okuma sayısı
+METER_BATCH_MAX = 32
+
+
 class MyChargePoint(cp):
-    
-    async def send_meter_values(self, kwh_value):
-        """ CSMS'e (Merkez) MeterValues gönderir. """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # CAN okumaları (zaman, kWh) olarak bu kuyruğa yazılır,
+        # tek bir yazıcı görevi gönderir
+        self.out_q = asyncio.Queue(maxsize=1024)
+
+    def enqueue_reading(self, kwh_value):
+        """ Okumayı CAN'den alındığı anın zamanıyla kuyruğa bırakır.
+        Kuyruk doluysa (ağ yavaş) en eski okuma atılır. """
+        if self.out_q.full():
+            self.out_q.get_nowait()
+            print("ISTASYON (CP): Gönderim kuyruğu dolu, en eski okuma atlandı.")
+        self.out_q.put_nowait((iso_now(), kwh_value))
+
+    async def meter_writer(self):
+        """ Kuyruktaki okumaları toplayıp tek MeterValues mesajı olarak gönderir. """
+        while True:
+            batch = [await self.out_q.get()]
+            while not self.out_q.empty() and len(batch) < METER_BATCH_MAX:
+                batch.append(self.out_q.get_nowait())
+            await self.send_meter_values(batch)
+
+    async def send_meter_values(self, readings):
+        """ CSMS'e (Merkez) (zaman, kWh) okumalarını tek MeterValues ile gönderir. """
         payload = call.MeterValues(
             connector_id=1,
             transaction_id=12345,  # Senaryo için sabit bir ID
             meter_value=[
                 {
-                    "timestamp": datetime.utcnow().isoformat() + "Z", # 'Z' eklendi (UTC)
+                    "timestamp": timestamp,
                     "sampledValue": [
                         {
                             "value": str(kwh_value),
@@ -30,11 +61,12 @@ class MyChargePoint(cp):
                         }
                     ]
                 }
+                for timestamp, kwh_value in readings
             ]
         )
         
         try:
-            print(f"ISTASYON (CP) -> MERKEZ (CSMS): {kwh_value} kWh raporlanıyor...")
+            print(f"ISTASYON (CP) -> MERKEZ (CSMS): {', '.join(str(kwh) for _, kwh in readings)} kWh raporlanıyor...")
             response = await self.call(payload)
             # print(f"ISTASYON (CP): MeterValues onayı alındı: {response}")
         except Exception as e:
@@ -64,12 +96,13 @@ async def can_listener(bus, cp_instance):
     
     try:
         async for message in reader:
-            if message.arbitration_id == 0x300:
+            if message.arbitration_id == 0x300 and len(message.data) >= 4:
                 # Gelen 4 byte'lık veriyi (little-endian) integer'a çevir
-                energy_int = int.from_bytes(message.data[:4], byteorder='little')
+                # (slice kopyası yapmadan doğrudan tampondan okunur)
+                energy_int, = U32LE.unpack_from(message.data)
                 
                 # Veriyi kWh float değerine dönüştür (gönderirken *10 yapmıştık)
-                real_energy_kwh = round(energy_int / 10.0, 1)
+                real_energy_kwh = energy_int / 10
                 
                 print(f"\nISTASYON (CP): CAN [0x300] alındı. GERÇEK DEĞER: {real_energy_kwh} kWh")
 
@@ -82,8 +115,8 @@ async def can_listener(bus, cp_instance):
 
                 # Eğer CP, CSMS'e bağlıysa, bu veriyi OCPP ile gönder
                 if cp_instance:
-                    # Merkeze 'send_meter_values' ile FAKE (sahte) veriyi gönder
-                    asyncio.create_task(cp_instance.send_meter_values(fake_energy_kwh))
+                    # Merkeze FAKE (sahte) veriyi gönder (yazıcı görevi kuyruktan alır)
+                    cp_instance.enqueue_reading(fake_energy_kwh)
                 else:
                     print("ISTASYON (CP): CSMS bağlantısı henüz yok. MeterValues gönderilemiyor.")
 
@@ -94,6 +127,14 @@ async def can_listener(bus, cp_instance):
         print("ISTASYON (CP): CAN dinleyici durdu.")
 
 
+async def cancel_and_wait(*tasks):
+    """ Görevleri iptal eder ve gerçekten bitmelerini bekler. """
+    tasks = [t for t in tasks if t is not None]
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
 # BU FONKSİYON TAMAMEN YENİDEN YAZILDI
 async def main_cp(bus):
     global connected_charge_point
@@ -102,11 +143,19 @@ async def main_cp(bus):
     url = "ws://127.0.0.1:9000/CP_001" 
     
     can_task = None
+    writer_task = None
+    ocpp_task = None
+
+    # SIGTERM gelince bağlantı düzgünce kapatılır
+    stop_event = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop_event.set)
+    stop_task = asyncio.create_task(stop_event.wait())
     try:
         # 'websockets.connect' doğru async context manager'dır
         async with websockets.connect(
             url,
-            subprotocols=['ocpp1.6']
+            subprotocols=['ocpp1.6'],
+            compression=None  # Küçük mesajlar için deflate kapalı
         ) as ws:
             
             print("ISTASYON (CP): Merkeze (CSMS) bağlanıldı.")
@@ -121,22 +170,25 @@ async def main_cp(bus):
 
             # 1. CAN dinleyiciyi arka planda bir görev olarak başlat
             can_task = asyncio.create_task(can_listener(bus, charge_point))
+            writer_task = asyncio.create_task(charge_point.meter_writer())
             
             # İlk BootNotification'ı gönder
             await charge_point.send_boot_notification()
 
             # 2. Ana OCPP döngüsünü başlat (Merkez'den gelen mesajları dinler)
-            # Bu fonksiyon, bağlantı kapanana kadar (veya hata alana kadar) çalışır.
-            await charge_point.start()
+            # Bu görev, bağlantı kapanana kadar (veya hata alana kadar) çalışır.
+            ocpp_task = asyncio.create_task(charge_point.start())
+            await asyncio.wait({ocpp_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+            if ocpp_task.done():
+                ocpp_task.result()  # Bağlantı hatası varsa aşağıda yakalanır
 
     except Exception as e:
         print(f"ISTASYON (CP): Bağlantı hatası: {e}")
         if isinstance(e, websockets.exceptions.ConnectionClosedError):
             print("     -> CSMS sunucusu çalışmıyor veya bağlantıyı reddetti.")
     finally:
-        # Program kapanırken CAN görevini de temizle
-        if can_task and not can_task.done():
-            can_task.cancel()
+        # Program kapanırken arka plan görevlerini iptal et ve bitmelerini bekle
+        await cancel_and_wait(can_task, writer_task, ocpp_task, stop_task)
         if connected_charge_point:
             connected_charge_point = None
         print("ISTASYON (CP): Bağlantı kapandı.")
@@ -152,6 +204,13 @@ if __name__ == "__main__":
         exit(1)
 
     print("İstasyon (CP) Simülatörü [NORMAL MOD] başlatıldı...")
+    # uvloop kuruluysa libuv tabanlı event loop kullan (yoksa varsayılan loop)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
     try:
         asyncio.run(main_cp(can_bus))
     except KeyboardInterrupt:
@@ -1,16 +1,31 @@
 import asyncio
 import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
 import websockets
-from datetime import datetime
 
 # GEREKLİ İMPORTLAR EKLENDİ
 from ocpp.v16 import ChargePoint as cp 
 from ocpp.v16 import call_result
 from ocpp.v16.enums import RegistrationStatus, Action  # <-- 'Action' eklendi
 from ocpp.routing import on  # <-- '@on' dekore edicisini doğru yerden import et
+from iso_time import iso_now
 
 logging.basicConfig(level=logging.INFO)
 
+# MeterValues ayrıştırmasında her örnekte kullanılan anahtarlar/sabitler
+KEY_SAMPLED_VALUE = sys.intern("sampled_value")
+KEY_MEASURAND = sys.intern("measurand")
+KEY_VALUE = sys.intern("value")
+ENERGY_ACTIVE_IMPORT = sys.intern("Energy.Active.Import.Register")
+
+CSMS_HOST = '0.0.0.0'
+CSMS_PORT = 9000
+# Aynı portu dinleyen süreç sayısı (SO_REUSEPORT ile çekirdek bağlantıları dağıtır)
+CSMS_WORKERS = int(os.environ.get("CSMS_WORKERS", "1"))
 
 class CentralSystem(cp):
     """
@@ -27,7 +42,7 @@ class CentralSystem(cp):
         
         # CP'ye onay yanıtı gönder
         return call_result.BootNotification(
-            current_time=datetime.utcnow().isoformat() + "Z",
+            current_time=iso_now(),
             interval=10,  # Heartbeat interval
             status=RegistrationStatus.accepted
         )
@@ -44,32 +59,10 @@ class CentralSystem(cp):
         try:
             for mv in meter_value:
                 # 'sampled_value' (snake_case) kullan
-                for sv in mv['sampled_value']: 
-                    # 'measurand' ve 'value' (zaten snake_case'e yakın)
-                    if sv['measurand'] == "Energy.Active.Import.Register":
-                        print(f"  -> OKUNAN DEĞER: {sv['value']} kWh")
-        except Exception as e:
-            print(f"  -> MeterValues verisi işlenirken hata: {e}")
-            
-        print("---------------------------------------------")
-        
-        # CP'ye onay mesajı gönder
-        return call_result.MeterValues()
-        """ CP'den MeterValues aldığımızda. """
-        print("---------------------------------------------")
-        print(f"MERKEZ (CSMS): '{self.id}' sitesinden MeterValues alındı:")
-        
-        # HATA DÜZELTMESİ (TEKRAR):
-        # 'mv' bir sözlüktür (dict). Veriye nesne gibi (mv.sampled_value)
-        # değil, sözlük anahtarı (mv['sampledValue']) ile erişmeliyiz.
-        # Anahtarlar, JSON'daki gibi BÜYÜK/küçük harfe duyarlıdır.
-        try:
-            for mv in meter_value:
-                # mv['sampledValue'] (CamelCase) kullan
-                for sv in mv['sampledValue']: 
-                    # sv['measurand'] ve sv['value'] (camelCase) kullan
-                    if sv['measurand'] == "Energy.Active.Import.Register":
-                        print(f"  -> OKUNAN DEĞER: {sv['value']} kWh")
+                for sv in mv[KEY_SAMPLED_VALUE]:
+                    # 'measurand' opsiyonel alan; yoksa KeyError yerine None
+                    if sv.get(KEY_MEASURAND) == ENERGY_ACTIVE_IMPORT:
+                        print(f"  -> OKUNAN DEĞER: {sv[KEY_VALUE]} kWh")
         except Exception as e:
             print(f"  -> MeterValues verisi işlenirken hata: {e}")
             
@@ -95,23 +88,85 @@ async def on_connect(websocket):
         await cs.start()
 
     except Exception as e:
-        logging.error(f"MERKEZ (CSMS): Bağlantı hatası: {e}", exc_info=True)
+        logging.error("MERKEZ (CSMS): Bağlantı hatası: %s", e, exc_info=True)
+
+
+def make_reuseport_socket(port, host=CSMS_HOST, workers=CSMS_WORKERS):
+    """
+    Dinleme soketi oluşturur. Birden fazla worker varsa SO_REUSEPORT açılır;
+    her worker kendi soketini aynı porta bağlar ve gelen bağlantılar çekirdek
+    tarafından dağıtılır. SO_REUSEPORT olmayan platformlarda (Windows) ve tek
+    worker'da düz soket kullanılır.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if workers > 1 and hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
 
 
 async def main():
-    print("CSMS Sunucusu 9000 portunda başlatıldı... (Decorator'lu Versiyon)")
-    
-    server = await websockets.serve(
+    print(f"CSMS Sunucusu {CSMS_PORT} portunda başlatıldı... (Decorator'lu Versiyon, pid={os.getpid()})")
+
+    # SIGINT/SIGTERM gelince sunucu kapanır ve açık bağlantılar temizlenir
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # Windows: loop sinyal handler'ı desteklemez; Ctrl+C run_worker'da KeyboardInterrupt olarak yakalanır
+            break
+
+    async with websockets.serve(
         on_connect,
-        '0.0.0.0',
-        9000,
-        subprotocols=['ocpp1.6']
-    )
-    
-    await server.wait_closed()
+        sock=make_reuseport_socket(CSMS_PORT),
+        subprotocols=['ocpp1.6'],
+        # Küçük OCPP JSON mesajlarında deflate CPU maliyeti kazançtan büyük
+        compression=None,
+        max_size=2**20,
+        write_limit=2**20
+    ):
+        await stop_event.wait()
+
+    print("\nCSMS Sunucusu kapatıldı.")
+
+def run_worker():
+    # uvloop kuruluysa libuv tabanlı event loop kullan (yoksa varsayılan loop)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
 
-if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("\nCSMS Sunucusu kapatıldı.")
\ No newline at end of file
+        print("\nCSMS Sunucusu kapatıldı.")
+
+if __name__ == "__main__":
+    if CSMS_WORKERS <= 1:
+        run_worker()
+    else:
+        # CP'ler arasında paylaşılan durum yok; her worker bağımsız bir event loop çalıştırır
+        workers = [multiprocessing.Process(target=run_worker) for _ in range(CSMS_WORKERS)]
+        for w in workers:
+            w.start()
+
+        # SIGTERM yalnızca ana sürece gelir; worker'lara ilet, aşağıdaki join kapanmalarını bekler
+        def forward_sigterm(signum, frame):
+            for w in workers:
+                if w.is_alive():
+                    w.terminate()
+        signal.signal(signal.SIGTERM, forward_sigterm)
+
+        try:
+            for w in workers:
+                w.join()
+        except KeyboardInterrupt:
+            # Ctrl+C worker'lara da ulaşır; kendi kapanışlarını bitirmelerini bekle
+            for w in workers:
+                w.join()
@@ -0,0 +1,20 @@
+"""
+ISO zaman damgası yardımcısı: csms_server.py ve CP simülatörleri ortak kullanır.
+"""
+import time
+
+# (saniye, "YYYY-MM-DDTHH:MM:SS") önbelleği; tek tuple olarak değiştirilir, böylece
+# eşzamanlı çağrılar bir saniyeyi başka bir saniyenin önekiyle eşleştiremez
+_prefix = (None, "")
+
+
+def iso_now():
+    """ Şu anki UTC zamanını '...Z' biçiminde döner (utcnow().isoformat() + 'Z' yerine). """
+    global _prefix
+    now = time.time()
+    sec = int(now)
+    cached_sec, prefix = _prefix
+    if sec != cached_sec:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+        _prefix = (sec, prefix)
+    return f"{prefix}.{int((now - sec) * 1e6):06d}Z"
@@ -1,6 +1,10 @@
 import can
+import struct
 import time
 
+# 4 byte, little-endian, işaretsiz tamsayı (enerji * 10)
+U32LE = struct.Struct("<I")
+
 def send_meter_reading(bus, energy_kwh):
     """
     CAN bus üzerinden enerji okuma (kWh) bilgisi gönderir.
@@ -13,7 +17,7 @@ def send_meter_reading(bus, energy_kwh):
         
         # 4 byte'a (32-bit integer) dönüştür
         # little-endian (düşük byte önce)
-        data_payload = energy_int.to_bytes(4, byteorder='little')
+        data_payload = U32LE.pack(energy_int)
 
         message = can.Message(
             arbitration_id=0x300,
@@ -1,87 +1,121 @@
-import asyncio, websockets, json, uuid, argparse, csv, os, time
+import asyncio, websockets, uuid, argparse, csv, os, time
 from datetime import datetime, timezone
+# orjson isteğe bağlı: yoksa standart json (ikisinin hatası da ValueError)
+try: from orjson import loads as json_loads
+except ImportError: from json import loads as json_loads
 
 def now_ts(): return datetime.now(timezone.utc).isoformat()
 def mid(): return str(uuid.uuid4())[:8]
 
-# ---- OCPP 1.6 payloads ----
-def boot_payload():
-    return {
-        "chargePointVendor": "DemoVendor",
-        "chargePointModel": "DemoModel",
-        "chargePointSerialNumber": "CP-01",
-        "firmwareVersion": "1.0.0",
-        "iccid": "8988307000000000000",
-        "imsi": "001010123456789",
-        "meterType": "DemoMeter",
-        "meterSerialNumber": "M-001"
-    }
+# ---- OCPP 1.6 frames ----
+# Sabit kısımlar bir kez hazırlanır; her mesajda sadece id/zaman/değer doldurulur.
+BOOT_FRAME = ('[2,"%s","BootNotification",{"chargePointVendor":"DemoVendor",'
+              '"chargePointModel":"DemoModel","chargePointSerialNumber":"CP-01",'
+              '"firmwareVersion":"1.0.0","iccid":"8988307000000000000",'
+              '"imsi":"001010123456789","meterType":"DemoMeter","meterSerialNumber":"M-001"}]')
+START_FRAME = '[2,"%s","StartTransaction",{"connectorId":1,"idTag":"TAG1","meterStart":0,"timestamp":"%s"}]'
+MV_FRAME = ('[2,"%s","MeterValues",{"connectorId":1,"transactionId":"%s","meterValue":'
+            '[{"timestamp":"%s","sampledValue":[{"value":"%s","measurand":"Energy.Active.Import.Register"}]}]}]')
+STOP_FRAME = '[2,"%s","StopTransaction",{"transactionId":"%s","meterStop":%d,"timestamp":"%s","idTag":"TAG1"}]'
 
-def start_payload():
-    return {"connectorId":1, "idTag":"TAG1", "meterStart":0, "timestamp": now_ts()}
+def boot_frame(m): return BOOT_FRAME % m
+def start_frame(m): return START_FRAME % (m, now_ts())
+def mv_frame(m, tx, val): return MV_FRAME % (m, tx, now_ts(), val)
+def stop_frame(m, tx, mstop=10): return STOP_FRAME % (m, tx, mstop, now_ts())
 
-def mv_payload(tx, val):
-    return {
-        "connectorId":1,
-        "transactionId": tx,
-        "meterValue":[
-            {"timestamp": now_ts(),
-             "sampledValue":[{"value": str(val), "measurand":"Energy.Active.Import.Register"}]}
-        ]
-    }
+# ---- Pipelined gönderim ----
+# Gönderici kuyruktaki frame'leri tam hızda yazar; alıcı cevapları
+# mesaj id'sine göre bekleyen future'lara dağıtır.
+async def sender(ws, q):
+    while True:
+        await ws.send(await q.get())
+        q.task_done()
 
-def stop_payload(tx, m=10):
-    return {"transactionId": tx, "meterStop": m, "timestamp": now_ts(), "idTag":"TAG1"}
+async def receiver(ws, pending):
+    async for raw in ws:
+        try:
+            msg = json_loads(raw)
+        except ValueError:
+            continue
+        fut = pending.pop(msg[1], None) if isinstance(msg, list) and len(msg) > 1 else None
+        if fut and not fut.done(): fut.set_result(msg)
 
-async def send(ws, arr):
-    await ws.send(json.dumps(arr))
-    try:
-        return await asyncio.wait_for(ws.recv(), timeout=1.5)
-    except Exception:
-        return None
+def enqueue(q, pending, m, frame):
+    fut = pending[m] = asyncio.get_running_loop().create_future()
+    q.put_nowait(frame)
+    return fut
 
-async def run(url, scenario, count, out):
+CSV_HEADER = ["session_id","event","message_id","ts_epoch","ts_iso"]
+CSV_FLUSH_ROWS = 512  # bu kadar satır birikince toplu yazılır
+
+def write_rows(out, rows):
     new = not os.path.exists(out)
     with open(out, "a", newline="") as f:
         w = csv.writer(f)
-        if new: w.writerow(["session_id","event","message_id","ts_epoch","ts_iso"])
+        if new: w.writerow(CSV_HEADER)
+        w.writerows(rows)
+
+async def flush_rows(out, rows):
+    batch = rows[:]; rows.clear()
+    await asyncio.to_thread(write_rows, out, batch)
+
+async def run(url, scenario, count, out):
+    rows = []  # CSV satırları bellekte toplanır, dosyaya event loop dışında yazılır
+    try:
         # IMPORTANT: OCPP 1.6 subprotocol
-        async with websockets.connect(url, subprotocols=["ocpp1.6"], ping_interval=20) as ws:
+        async with websockets.connect(url, subprotocols=["ocpp1.6"], ping_interval=20, compression=None) as ws:
+            q, pending = asyncio.Queue(), {}
+            tasks = [asyncio.create_task(sender(ws, q)), asyncio.create_task(receiver(ws, pending))]
+            def send(m, frame): return enqueue(q, pending, m, frame)
+
             # 0) BootNotification
-            bmsg = [2, mid(), "BootNotification", boot_payload()]
-            await send(ws, bmsg)
-            w.writerow(["BOOT","BootNotification", bmsg[1], time.time(), now_ts()])
+            bid = mid()
+            send(bid, boot_frame(bid))
+            rows.append(["BOOT","BootNotification", bid, time.time(), now_ts()])
             await asyncio.sleep(0.2)
 
             # N adet oturum
             for i in range(count):
                 tx = mid()
                 # 1) Start
-                s1 = [2, mid(), "StartTransaction", start_payload()]
-                await send(ws,s1); w.writerow([tx,"Start",s1[1],time.time(),now_ts()]); await asyncio.sleep(0.1)
+                s1 = mid()
+                send(s1, start_frame(s1)); rows.append([tx,"Start",s1,time.time(),now_ts()]); await asyncio.sleep(0.1)
 
                 if scenario=="out_of_order":
                     # 2) Stop'u bilerek erken gönder
-                    st = [2, mid(), "StopTransaction", stop_payload(tx, m=3+i)]
-                    await send(ws,st); w.writerow([tx,"Stop(early)",st[1],time.time(),now_ts()]); await asyncio.sleep(0.2)
+                    st = mid()
+                    send(st, stop_frame(st, tx, mstop=3+i)); rows.append([tx,"Stop(early)",st,time.time(),now_ts()]); await asyncio.sleep(0.2)
                     # 3) MeterValues'u geç gönder
-                    mv = [2, mid(), "MeterValues", mv_payload(tx, val=2.0+i)]
-                    await send(ws,mv); w.writerow([tx,"MeterValues(late)",mv[1],time.time(),now_ts()])
+                    mv = mid()
+                    send(mv, mv_frame(mv, tx, val=2.0+i)); rows.append([tx,"MeterValues(late)",mv,time.time(),now_ts()])
                 elif scenario=="duplicate_start":
-                    s2 = [2, mid(), "StartTransaction", start_payload()]
-                    await send(ws,s2); w.writerow([tx,"Start(DUP)",s2[1],time.time(),now_ts()]); await asyncio.sleep(0.2)
-                    st = [2, mid(), "StopTransaction", stop_payload(tx)]
-                    await send(ws,st); w.writerow([tx,"Stop",st[1],time.time(),now_ts()])
+                    s2 = mid()
+                    send(s2, start_frame(s2)); rows.append([tx,"Start(DUP)",s2,time.time(),now_ts()]); await asyncio.sleep(0.2)
+                    st = mid()
+                    send(st, stop_frame(st, tx)); rows.append([tx,"Stop",st,time.time(),now_ts()])
                 elif scenario=="missing_meter":
-                    st = [2, mid(), "StopTransaction", stop_payload(tx, m=0)]
-                    await send(ws,st); w.writerow([tx,"Stop(no MV)",st[1],time.time(),now_ts()])
+                    st = mid()
+                    send(st, stop_frame(st, tx, mstop=0)); rows.append([tx,"Stop(no MV)",st,time.time(),now_ts()])
                 else:
-                    mv = [2, mid(), "MeterValues", mv_payload(tx, val=5.0+i)]
-                    await send(ws,mv); w.writerow([tx,"MeterValues",mv[1],time.time(),now_ts()]); await asyncio.sleep(0.2)
-                    st = [2, mid(), "StopTransaction", stop_payload(tx)]
-                    await send(ws,st); w.writerow([tx,"Stop",st[1],time.time(),now_ts()])
+                    mv = mid()
+                    send(mv, mv_frame(mv, tx, val=5.0+i)); rows.append([tx,"MeterValues",mv,time.time(),now_ts()]); await asyncio.sleep(0.2)
+                    st = mid()
+                    send(st, stop_frame(st, tx)); rows.append([tx,"Stop",st,time.time(),now_ts()])
+                if len(rows) >= CSV_FLUSH_ROWS: await flush_rows(out, rows)
                 await asyncio.sleep(0.8)
 
+            # Kuyruk boşalsın, geç gelen cevaplar için kısa süre bekle.
+            # Bağlantı koparsa sender ölür ve task_done() çağrılmaz: q.join() ile
+            # birlikte sender da beklenir, hangisi önce biterse
+            drained = asyncio.create_task(q.join())
+            await asyncio.wait([drained, tasks[0]], return_when=asyncio.FIRST_COMPLETED)
+            if pending and drained.done(): await asyncio.wait(list(pending.values()), timeout=1.5)
+            tasks.append(drained)
+            for t in tasks: t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await flush_rows(out, rows)
+
 if __name__=="__main__":
     p=argparse.ArgumentParser()
     p.add_argument("--url", required=True)
@@ -89,4 +123,6 @@ if __name__=="__main__":
     p.add_argument("--count", type=int, default=5)
     p.add_argument("--out", default="results.csv")
     a=p.parse_args()
+    try: import uvloop; asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError: pass
     asyncio.run(run(a.url,a.scenario,a.count,a.out))
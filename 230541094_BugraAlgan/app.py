@@ -1,10 +1,31 @@
 # proje.py
+# eventlet kuruluysa diğer tüm importlardan önce monkey-patch yapılmalı
+try:
+    import eventlet
+    eventlet.monkey_patch()
+    ASYNC_MODE = "eventlet"
+except ImportError:
+    ASYNC_MODE = "threading"
+
 import time
 import math
-import random
+import queue
 import threading
+from collections import deque
+from operator import itemgetter
 from datetime import datetime, timezone
 
+import numpy as np
+
+# numba kuruluysa röle durum makinesi native koda derlenir; yoksa saf Python çalışır
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
 from flask import Flask, render_template, send_from_directory, jsonify, Response
 from flask_socketio import SocketIO, emit
 
@@ -13,25 +34,106 @@ THRESHOLD_C = 75.0
 COOL_DOWN_SECONDS = 300
 STATION_ID = "ST-009"
 STEP_INTERVAL = 1.0   # saniye
+FLUSH_MS = 100        # sim_data_batch gönderim aralığı (ms)
+NOISE_BUF_SIZE = 8192 # sensör başına önceden üretilen gürültü örneği
+LOG_CAPACITY = 4096   # halka log tamponundaki satır sayısı
 # ----------------------------
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
-# use threading mode so it works without eventlet/gevent if not installed
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
+# eventlet varsa onun sunucusu kullanılır (gunicorn -k eventlet ile de çalışır);
+# yoksa threading moduna düşer ve Werkzeug dev sunucusuyla çalışır
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
 
 # ---------------- Simulation classes (düzeltilmiş) ----------------
+# relay_fsm olay kodları -> EVENT_NAMES içindeki metin (JIT sınırından string geçmez)
+EV_NONE = 0
+EV_MISMATCH = 1
+EV_S1_ONLY = 2
+EV_SHUTDOWN = 3
+EV_RESTART = 4
+EV_PERSISTENT = 5
+EV_OK = 6
+EV_OPEN = 7
+EVENT_NAMES = (
+    None,
+    "Sensor deviation detected (mismatch); logged",
+    "High reading on S1 only; awaiting confirmation",
+    "Unexpected thermal shutdown during charging.",
+    "Auto-restart after cooldown",
+    "Persistent high sensor reading during cooldown",
+    "OK",
+    "SHUTDOWN",
+)
+
+@njit(cache=True)
+def relay_fsm(r1, r2, double_sensor, threshold, relay_closed, current,
+              last_shutdown_ts, now, cooldown):
+    # eşik/röle/cooldown kararı; sadece skalerler (r2 yoksa NaN, shutdown yoksa -1)
+    # dönüş: (relay_closed, current, last_shutdown_ts, event_id)
+    event_id = EV_NONE
+    if relay_closed:
+        alarm = False
+        if double_sensor:
+            if r1 > threshold and r2 > threshold:
+                alarm = True
+            elif r1 > threshold and abs(r1 - r2) > 5.0:
+                event_id = EV_MISMATCH
+            elif r1 > threshold and r2 <= threshold:
+                # conservative: mark but do not immediate shutdown
+                event_id = EV_S1_ONLY
+        else:
+            if r1 > threshold:
+                alarm = True
+
+        if alarm:
+            relay_closed = False
+            current = 0.0
+            last_shutdown_ts = now
+            event_id = EV_SHUTDOWN
+    else:
+        # relay açık (shutdown) durumunda cooldown kontrolü
+        if last_shutdown_ts >= 0.0:
+            if now - last_shutdown_ts >= cooldown:
+                if r1 < (threshold - 5.0) and (not double_sensor or r2 < (threshold - 5.0)):
+                    relay_closed = True
+                    current = 200.0
+                    event_id = EV_RESTART
+            else:
+                if r1 > threshold:
+                    event_id = EV_PERSISTENT
+
+    if event_id == EV_NONE:
+        event_id = EV_OK if relay_closed else EV_OPEN
+    return relay_closed, current, last_shutdown_ts, event_id
+
 class ThermalSensor:
     def __init__(self, name="S1", bias=0.0, noise_std=0.5):
         self.name = name
         self.bias = bias
         self.noise_std = noise_std
         self.last_value = None
+        # birim normal gürültü tamponu; noise_std okuma anında uygulanır
+        # (set_faulty ile değişse bile tamponu yeniden üretmeye gerek kalmaz)
+        self._rng = np.random.default_rng()
+        self._refill()
+
+    def _refill(self):
+        self._noise = self._rng.standard_normal(NOISE_BUF_SIZE).astype(np.float32).tolist()
+        self._i = 0
 
     def read(self, true_temp):
-        val = true_temp + self.bias + random.gauss(0, self.noise_std)
+        if self._i >= NOISE_BUF_SIZE:
+            self._refill()
+        n = self._noise[self._i]
+        self._i += 1
+        val = true_temp + self.bias + n * self.noise_std
         self.last_value = val
         return val
 
+    def noise(self, n):
+        # toplu simülasyon için n örneklik gürültü dizisi
+        return self._rng.standard_normal(n) * self.noise_std
+
     def inject_drift(self, delta):
         self.bias += delta
 
@@ -40,74 +142,83 @@ class ThermalSensor:
         self.bias = fixed_value - 25.0
         self.noise_std = 0.0
 
+class NullScenario:
+    """Normal senaryo: tick başına hiçbir şey enjekte etmez."""
+    __slots__ = ()
+
+    def apply(self, t_sec, station):
+        pass
+
+    def drift_array(self, t):
+        return None
+
+class DriftScenario:
+    """[start, end] saniye aralığında her tick S1 sensörüne delta kadar drift ekler."""
+    __slots__ = ("start", "end", "delta")
+
+    def __init__(self, start, end, delta):
+        self.start = start
+        self.end = end
+        self.delta = delta
+
+    def apply(self, t_sec, station):
+        if self.start <= t_sec <= self.end:
+            station.s1.inject_drift(self.delta)
+
+    def drift_array(self, t):
+        # simulate_window için tick başına drift dizisi
+        drift = np.zeros(t.size)
+        drift[(t >= self.start) & (t <= self.end)] = self.delta
+        return drift
+
+def make_scenario(name, double_sensor=False):
+    # senaryo adı bir kez çözülür; step() her tick sadece scenario.apply() çağırır
+    if name == "drift":
+        return DriftScenario(30, 35, 30.0)
+    if name == "transient":
+        return DriftScenario(30, 32, 35.0)
+    if name == "double_sensor_fail" and double_sensor:
+        return DriftScenario(30, 35, 30.0)
+    return NullScenario()
+
 class ChargerStation:
-    def __init__(self, station_id=STATION_ID, threshold=THRESHOLD_C, double_sensor=False):
+    def __init__(self, station_id=STATION_ID, threshold=THRESHOLD_C, double_sensor=False, scenario=None):
         self.station_id = station_id
         self.threshold = threshold
         self.relay_closed = True
+        # röle her değiştiğinde artar; status önbelleğinin geçerliliği buna bakar
+        self.status_rev = 0
         self.last_shutdown_ts = None
         self.double_sensor = double_sensor
         self.s1 = ThermalSensor("S1")
         self.s2 = ThermalSensor("S2") if double_sensor else None
+        self.scenario = scenario or NullScenario()
         self.true_temp = 45.0
         self.current = 200.0
-        self.log = []
+        # log, sütun bazlı halka tampon olarak tutulur; metin sadece okunurken üretilir
+        self._log_ts = np.zeros(LOG_CAPACITY, dtype=np.int64)
+        self._log_s1 = np.zeros(LOG_CAPACITY, dtype=np.float32)
+        self._log_true = np.zeros(LOG_CAPACITY, dtype=np.float32)
+        self._log_i = np.zeros(LOG_CAPACITY, dtype=np.float32)
+        self._log_event_id = np.zeros(LOG_CAPACITY, dtype=np.uint8)
+        self._log_head = 0
+        self._event_ids = {}
+        self._event_names = []
+        # log zaman damgası için (saniye, önek) önbelleği; sim görevi ve /api/logs
+        # aynı anda okuyabildiği için tek tuple olarak değiştirilir
+        self._ts_prefix = (None, "")
 
-    def step(self, t_sec, scenario=None):
+    def step(self, t_sec):
         # gerçek sıcaklık dinamiği (basit)
         self.true_temp += 0.005 * math.sin(t_sec / 5.0) + 0.01
 
         # senaryo enjekte etme
-        if scenario == "drift" and 30 <= t_sec <= 35:
-            self.s1.inject_drift(30.0)
-        if scenario == "transient" and 30 <= t_sec <= 32:
-            self.s1.inject_drift(35.0)
-        if scenario == "double_sensor_fail" and 30 <= t_sec <= 35 and self.double_sensor:
-            self.s1.inject_drift(30.0)
+        self.scenario.apply(t_sec, self)
 
         r1 = self.s1.read(self.true_temp)
         r2 = self.s2.read(self.true_temp) if self.double_sensor else None
 
-        event = None
-        alarm = False
-
-        if self.relay_closed:
-            if self.double_sensor:
-                if r1 > self.threshold and r2 > self.threshold:
-                    alarm = True
-                elif r1 > self.threshold and (abs(r1 - r2) > 5.0):
-                    event = "Sensor deviation detected (mismatch); logged"
-                elif r1 > self.threshold and r2 <= self.threshold:
-                    # conservative: mark but do not immediate shutdown
-                    event = "High reading on S1 only; awaiting confirmation"
-            else:
-                if r1 > self.threshold:
-                    alarm = True
-
-            if alarm:
-                self.relay_closed = False
-                self.current = 0.0
-                self.last_shutdown_ts = time.time()
-                event = event or "Unexpected thermal shutdown during charging."
-                self._log_event(r1, event)
-                self._notify_tech(event, r1)
-        else:
-            # relay açık (shutdown) durumunda cooldown kontrolü
-            if self.last_shutdown_ts is not None:
-                elapsed = time.time() - self.last_shutdown_ts
-                if elapsed >= COOL_DOWN_SECONDS:
-                    if r1 < (self.threshold - 5.0) and (r2 is None or r2 < (self.threshold - 5.0)):
-                        self.relay_closed = True
-                        self.current = 200.0
-                        event = "Auto-restart after cooldown"
-                        self._log_event(r1, event)
-                else:
-                    if r1 > self.threshold:
-                        event = "Persistent high sensor reading during cooldown"
-                        self._log_event(r1, event)
-
-        if event is None:
-            event = "OK" if self.relay_closed else "SHUTDOWN"
+        event = self._update_relay(r1, r2)
 
         # final log (konsola yazdırma için suppress=False)
         self._log_event(r1, event, true_temp=self.true_temp, current=self.current, suppress_print=False)
@@ -122,14 +233,102 @@ class ChargerStation:
             "event": event
         }
 
+    def simulate_window(self, n, t0=0):
+        """
+        t0'dan başlayarak n tick'i (1 sn aralıklı) tek seferde simüle eder.
+        Sıcaklık, drift ve gürültü NumPy dizileri olarak hesaplanır; röle/cooldown
+        durum makinesi sıralı olduğu için hazır skaler değerler üzerinde döner.
+        Offline senaryo değerlendirmesi içindir, konsola her tick yazdırmaz.
+        """
+        if n <= 0:
+            return []
+        t = np.arange(t0, t0 + n)
+        true = self.true_temp + np.cumsum(0.005 * np.sin(t / 5.0) + 0.01)
+
+        # senaryo pencereleri step() ile aynı; drift her tick'te birikir
+        drift1 = self.scenario.drift_array(t)
+        bias1 = self.s1.bias + (np.cumsum(drift1) if drift1 is not None else np.zeros(n))
+
+        r1 = true + bias1 + self.s1.noise(n)
+        r2 = (true + self.s2.bias + self.s2.noise(n)).tolist() if self.double_sensor else [None] * n
+
+        results = []
+        for t_sec, tt, v1, v2 in zip(t.tolist(), true.tolist(), r1.tolist(), r2):
+            self.true_temp = tt
+            # cooldown simüle edilen tick zamanıyla işler (duvar saatiyle pencere içinde hiç dolmaz)
+            event = self._update_relay(v1, v2, now=t_sec)
+            self._log_event(v1, event)
+            results.append({
+                "time": t_sec,
+                "r1": v1,
+                "r2": v2,
+                "true_temp": tt,
+                "current": self.current,
+                "relay_closed": self.relay_closed,
+                "event": event
+            })
+
+        self.s1.bias = float(bias1[-1])
+        self.s1.last_value = results[-1]["r1"]
+        if self.double_sensor:
+            self.s2.last_value = results[-1]["r2"]
+        return results
+
+    def _update_relay(self, r1, r2, now=None):
+        # sayısal karar relay_fsm'de; burada sadece durum yazılır ve log/bildirim yapılır
+        # now: cooldown saati (verilmezse time.time())
+        relay_closed, self.current, shutdown_ts, event_id = relay_fsm(
+            r1, math.nan if r2 is None else r2, self.double_sensor, self.threshold,
+            self.relay_closed, self.current,
+            -1.0 if self.last_shutdown_ts is None else self.last_shutdown_ts,
+            time.time() if now is None else float(now), float(COOL_DOWN_SECONDS))
+        if relay_closed != self.relay_closed:
+            self.relay_closed = relay_closed
+            self.status_rev += 1
+        if shutdown_ts >= 0.0:
+            self.last_shutdown_ts = shutdown_ts
+
+        event = EVENT_NAMES[event_id]
+        if event_id in (EV_SHUTDOWN, EV_RESTART, EV_PERSISTENT):
+            self._log_event(r1, event)
+        if event_id == EV_SHUTDOWN:
+            self._notify_tech(event, r1)
+        return event
+
     def _log_event(self, sensor_val, event, true_temp=None, current=None, suppress_print=True):
-        ts = datetime.now(timezone.utc).isoformat()
         tt = true_temp if true_temp is not None else self.true_temp
         cur = current if current is not None else self.current
-        log_line = f"{ts} | {self.station_id} | S1={sensor_val:.2f}°C | True={tt:.2f}°C | I={cur:.2f}A | {event}"
-        self.log.append(log_line)
+        eid = self._event_ids.get(event)
+        if eid is None:
+            eid = self._event_ids[event] = len(self._event_names)
+            self._event_names.append(event)
+        idx = self._log_head % LOG_CAPACITY
+        self._log_ts[idx] = time.time_ns()
+        self._log_s1[idx] = sensor_val
+        self._log_true[idx] = tt
+        self._log_i[idx] = cur
+        self._log_event_id[idx] = eid
+        self._log_head += 1
         if not suppress_print:
-            print(log_line)
+            print(self._format_log_row(idx))
+
+    def _format_log_row(self, idx):
+        ns = int(self._log_ts[idx])
+        sec = ns // 1_000_000_000
+        cached_sec, prefix = self._ts_prefix
+        if sec != cached_sec:
+            prefix = datetime.fromtimestamp(sec, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+            self._ts_prefix = (sec, prefix)
+        ts = f"{prefix}.{(ns % 1_000_000_000) // 1000:06d}+00:00"
+        event = self._event_names[self._log_event_id[idx]]
+        return (f"{ts} | {self.station_id} | S1={self._log_s1[idx]:.2f}°C | "
+                f"True={self._log_true[idx]:.2f}°C | I={self._log_i[idx]:.2f}A | {event}")
+
+    def log_tail(self, n=200):
+        # son n log satırını eskiden yeniye metin olarak döner
+        head = self._log_head
+        count = min(n, head, LOG_CAPACITY)
+        return [self._format_log_row(i % LOG_CAPACITY) for i in range(head - count, head)]
 
     def _notify_tech(self, event, sensor_val):
         msg = f"[AUTONOTIFY] {datetime.now().isoformat()} - {self.station_id} - {event} - sensor={sensor_val:.1f}C"
@@ -138,29 +337,88 @@ class ChargerStation:
 # --------------- End simulation classes ----------------
 
 sim_instance = ChargerStation(double_sensor=True)
-_sim_thread = None
+# sim_loop socketio arka plan görevi olarak çalışır (eventlet'te greenlet, yoksa thread)
+_sim_running = threading.Event()
 _sim_thread_stop = threading.Event()
+# sim_data_batch içindeki her tick sabit sıralı bir tuple'dır; sayısal alanlar x100 tamsayı
+# (istemci 100'e bölerek geri ölçekler). Alan sırası bağlantıda "status" ile gönderilir.
+TICK_FIELDS = ("t", "s1", "s2", "true_temp", "current", "relay_closed", "event")
+# tarayıcıya henüz gönderilmemiş tick'ler (tek sim_data_batch olayında toplanır)
+PENDING = deque(maxlen=64)
+# emitter'a verilen son batch; istemci yavaşsa eskisi atılır, sadece en yenisi kalır
+_LATEST = queue.Queue(maxsize=1)
+# röle geçişi tick'leri asla atılmaz
+_ALARMS = deque()
 
-def sim_loop(scenario="normal", step_interval=STEP_INTERVAL):
-    start = time.time()
+def _publish(batch):
+    try:
+        _LATEST.put_nowait(batch)
+    except queue.Full:
+        try:
+            _LATEST.get_nowait()
+        except queue.Empty:
+            pass
+        _LATEST.put_nowait(batch)
+
+def _flush_pending(force=False):
+    if PENDING or force:
+        _publish(list(PENDING))
+        PENDING.clear()
+
+def emitter_loop():
+    while not _sim_thread_stop.is_set() or not _LATEST.empty():
+        try:
+            batch = _LATEST.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        alarms = []
+        while _ALARMS:
+            alarms.append(_ALARMS.popleft())
+        if alarms:
+            batch = sorted(batch + alarms, key=itemgetter(0))
+        if batch:
+            socketio.emit("sim_data_batch", batch)
+
+def sim_loop(step_interval=STEP_INTERVAL):
+    start = time.monotonic()
+    next_deadline = start
     t = 0
+    last_flush = time.monotonic()
+    prev_relay = sim_instance.relay_closed
     while not _sim_thread_stop.is_set():
         try:
-            out = sim_instance.step(int(t), scenario=scenario)
-            # websocket üzerinden tarayıcıya gönder
-            socketio.emit("sim_data", {
-                "t": int(t),
-                "s1": round(out["r1"], 2),
-                "s2": round(out["r2"], 2) if out["r2"] is not None else None,
-                "true_temp": round(out["true_temp"], 2),
-                "current": round(out["current"], 2),
-                "relay_closed": out["relay_closed"],
-                "event": out["event"]
-            })
+            out = sim_instance.step(int(t))
+            r2 = out["r2"]
+            tick = (
+                int(t),
+                round(out["r1"] * 100),
+                round(r2 * 100) if r2 is not None else None,
+                round(out["true_temp"] * 100),
+                round(out["current"] * 100),
+                out["relay_closed"],
+                out["event"]
+            )
+            now = time.monotonic()
+            if out["relay_closed"] != prev_relay:
+                # röle açıldı/kapandı: alarm kuyruğuna al ve gecikmesin diye hemen gönder
+                _ALARMS.append(tick)
+                _flush_pending(force=True)
+                last_flush = now
+            else:
+                PENDING.append(tick)
+                if now - last_flush >= FLUSH_MS / 1000:
+                    _flush_pending()
+                    last_flush = now
+            prev_relay = out["relay_closed"]
         except Exception as e:
             print("Simulation loop error:", e)
-        time.sleep(step_interval)
-        t = time.time() - start
+        # mutlak deadline ızgarası: kayma birikmez, geride kalınca uyumadan yetişir
+        next_deadline += step_interval
+        delay = next_deadline - time.monotonic()
+        if delay > 0:
+            socketio.sleep(delay)
+        t = next_deadline - start
+    _flush_pending()
 
 @app.route("/")
 def index():
@@ -174,29 +432,47 @@ def favicon():
 # Basit API (opsiyonel) - son logları döner
 @app.route("/api/logs")
 def api_logs():
-    return jsonify(sim_instance.log[-200:])
+    return jsonify(sim_instance.log_tail(200))
+
+# bağlantıda gönderilen status; sadece röle değişince (status_rev) yeniden üretilir
+_STATUS_CACHE = {"rev": -1, "data": None}
+
+def _status_snapshot():
+    rev = sim_instance.status_rev
+    if _STATUS_CACHE["rev"] != rev:
+        _STATUS_CACHE["data"] = {
+            "station": sim_instance.station_id,
+            "threshold": sim_instance.threshold,
+            "relay_closed": sim_instance.relay_closed,
+            "tick_fields": TICK_FIELDS
+        }
+        _STATUS_CACHE["rev"] = rev
+    return _STATUS_CACHE["data"]
 
 # Socket.IO events
 @socketio.on("connect")
 def on_connect():
     print("Client connected")
     # immediately send a status snapshot
-    emit("status", {
-        "station": sim_instance.station_id,
-        "threshold": sim_instance.threshold,
-        "relay_closed": sim_instance.relay_closed
-    })
+    emit("status", _status_snapshot())
 
 @socketio.on("disconnect")
 def on_disconnect():
     print("Client disconnected")
 
+def _run_sim(step_interval):
+    try:
+        sim_loop(step_interval=step_interval)
+    finally:
+        _sim_running.clear()
+
 def start_sim_thread(scenario="normal"):
-    global _sim_thread
-    if _sim_thread is None or not _sim_thread.is_alive():
+    if not _sim_running.is_set():
+        _sim_running.set()
         _sim_thread_stop.clear()
-        _sim_thread = threading.Thread(target=sim_loop, kwargs={"scenario": scenario, "step_interval": STEP_INTERVAL}, daemon=True)
-        _sim_thread.start()
+        sim_instance.scenario = make_scenario(scenario, sim_instance.double_sensor)
+        socketio.start_background_task(_run_sim, STEP_INTERVAL)
+        socketio.start_background_task(emitter_loop)
         print("Simulation thread started.")
 
 def stop_sim_thread():
@@ -212,4 +488,4 @@ if __name__ == "__main__":
 
     except KeyboardInterrupt:
         stop_sim_thread()
-        print("Shutting down.")
\ No newline at end of file
+        print("Shutting down.")
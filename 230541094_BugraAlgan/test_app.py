@@ -0,0 +1,35 @@
+# app.py ChargerStation.simulate_window testi: drift -> termal kesinti -> cooldown sonrası yeniden başlatma
+import unittest
+
+import numpy as np
+
+from app import ChargerStation, COOL_DOWN_SECONDS, EVENT_NAMES, EV_SHUTDOWN, EV_RESTART
+
+
+class PulseScenario:
+    """t=30'da S1'e +40 C drift, t=40'ta geri alınır (sadece simulate_window için)."""
+    __slots__ = ()
+
+    def apply(self, t_sec, station):
+        pass
+
+    def drift_array(self, t):
+        return np.where(t == 30, 40.0, 0.0) - np.where(t == 40, 40.0, 0.0)
+
+
+class TestSimulateWindow(unittest.TestCase):
+    def test_drift_shutdown_restart(self):
+        station = ChargerStation(scenario=PulseScenario())
+        ticks = station.simulate_window(COOL_DOWN_SECONDS + 100)
+
+        shutdown = [t["time"] for t in ticks if t["event"] == EVENT_NAMES[EV_SHUTDOWN]]
+        restart = [t["time"] for t in ticks if t["event"] == EVENT_NAMES[EV_RESTART]]
+        self.assertEqual(shutdown, [30])
+        # cooldown tick zamanıyla sayılır: pencere içinde dolar
+        self.assertEqual(restart, [30 + COOL_DOWN_SECONDS])
+        self.assertTrue(ticks[-1]["relay_closed"])
+        self.assertEqual(ticks[-1]["current"], 200.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
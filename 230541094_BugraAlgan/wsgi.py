@@ -0,0 +1,7 @@
+# wsgi.py
+# Üretim çalıştırma: gunicorn -k eventlet -w 1 -b 0.0.0.0:5000 wsgi:app
+# (Socket.IO oturumları süreç içinde tutulduğu için worker sayısı 1 olmalı)
+from app import app, start_sim_thread
+
+# gunicorn app.py'nin __main__ bloğunu çalıştırmaz; simülasyonu burada başlat
+start_sim_thread(scenario="drift")
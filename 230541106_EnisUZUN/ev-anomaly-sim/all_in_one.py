@@ -5,7 +5,7 @@ Single process: charger + anomaly logic + file writer
 NO CAN bus isolation issues!
 """
 import time
-import json
+import orjson
 import threading
 import random
 
@@ -31,8 +31,8 @@ def tx_loop():
         current = int(max(0, round(state["current"])))
         
         # Write to shared file for plotter
-        with open(DATA_FILE, 'w') as f:
-            json.dump({"timestamp": time.time(), "current": current}, f)
+        with open(DATA_FILE, 'wb') as f:
+            f.write(orjson.dumps({"timestamp": time.time(), "current": current}))
         
         print(f"⚡ Current: {current}A (target={state['target']}A, running={state['running']})")
         
@@ -66,10 +66,19 @@ def anomaly_loop():
         (30, 48, 6, "Standard operation"),
     ]
     
+    def scenario_iter():
+        # Shuffled permutation; reshuffle when exhausted (no repeats within a round)
+        xs = list(scenarios)
+        rng = random.Random()
+        while True:
+            rng.shuffle(xs)
+            yield from xs
+    
+    it = scenario_iter()
     cycle = 1
     while True:
-        # Randomly select a scenario
-        start_current, end_current, duration, description = random.choice(scenarios)
+        # Take next scenario from the shuffled round
+        start_current, end_current, duration, description = next(it)
         
         print(f"\n{'='*70}")
         print(f"🔄 ANOMALY CYCLE #{cycle}: {description}")
@@ -114,8 +123,8 @@ if __name__ == "__main__":
     print()
     
     # Initialize file
-    with open(DATA_FILE, 'w') as f:
-        json.dump({"timestamp": time.time(), "current": 0}, f)
+    with open(DATA_FILE, 'wb') as f:
+        f.write(orjson.dumps({"timestamp": time.time(), "current": 0}))
     
     # Start transmitter thread
     threading.Thread(target=tx_loop, daemon=True).start()
@@ -6,7 +6,9 @@ NO OCPP - just direct CAN → file bridge
 """
 import can
 import time
-import json
+import orjson
+import os
+import threading
 
 print("=" * 60)
 print("🌉 CAN→File Bridge Starting...")
@@ -17,25 +19,42 @@ bus = can.interface.Bus(interface="virtual", channel=0)
 print("✅ CAN bus connected")
 
 DATA_FILE = "/tmp/ev_current.json"
+# pid suffix: charger_module and the other bridges write DATA_FILE as well
+TMP_FILE = f"{DATA_FILE}.{os.getpid()}.tmp"
+
+
+def write_current(timestamp, current):
+    """Write reading to a temp file and atomically swap it in (no torn reads)"""
+    with open(TMP_FILE, 'wb') as f:
+        f.write(orjson.dumps({"timestamp": timestamp, "current": current}))
+    os.replace(TMP_FILE, DATA_FILE)
+
 print(f"📝 Writing to: {DATA_FILE}")
 print()
 
 # Initialize file
-with open(DATA_FILE, 'w') as f:
-    json.dump({"timestamp": time.time(), "current": 0}, f)
+write_current(time.time(), 0)
 
 print("📊 Listening for CAN 0x300 messages...")
 print()
 
-while True:
-    msg = bus.recv(timeout=0.5)
-    if msg and msg.arbitration_id == 0x300:
+def handle_frame(msg):
+    if msg.arbitration_id == 0x300:
         if len(msg.data) >= 2:
             # Decode current (little-endian)
             current = msg.data[0] + (msg.data[1] << 8)
             
             # Write to file
-            with open(DATA_FILE, 'w') as f:
-                json.dump({"timestamp": time.time(), "current": current}, f)
+            write_current(time.time(), current)
             
             print(f"RECEIVED: {current}A → Written to file")
+
+
+class BridgeListener(can.Listener):
+    def on_message_received(self, msg):
+        handle_frame(msg)
+
+
+# Notifier thread blocks on the bus and calls back per frame (no recv polling)
+notifier = can.Notifier(bus, [BridgeListener()])
+threading.Event().wait()
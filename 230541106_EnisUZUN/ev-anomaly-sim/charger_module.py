@@ -6,11 +6,26 @@ Publishes current readings (0x300) and responds to control commands.
 """
 import time
 import can
-import threading
+import json
+import os
+import struct
 
 # Initialize virtual CAN bus - STANDARDIZED
 bus = can.interface.Bus(bustype="virtual", channel="vcan0", bitrate=500000)
 
+# Latest-value JSON snapshot read by plot_current.py / data_collector.py / live_detector.py
+# (cp.py, all_in_one.py, can_to_file.py and current_bridge.py write it too)
+DATA_FILE = "/tmp/ev_current.json"
+# Per-process temp name: several scripts write DATA_FILE, and a shared temp path
+# would let one writer's os.replace publish (or clobber) another's half-written file
+TMP_FILE = f"{DATA_FILE}.{os.getpid()}.tmp"
+
+# Preallocated 0x300 payload: tx_loop packs the current into _CAN_BUF in place
+# (python-can keeps a bytearray by reference and copies it at send time)
+CURRENT_U16 = struct.Struct("<H")
+_CAN_BUF = bytearray(2)
+_CURRENT_MSG = can.Message(arbitration_id=0x300, data=_CAN_BUF, is_extended_id=False)
+
 # Charger state
 state = {
     "running": False,
@@ -19,68 +34,76 @@ state = {
     "current": 0.0
 }
 
-def rx_loop():
+def _dispatch(msg):
     """
-    Receive loop: Listen for CAN commands
+    Handle one CAN command frame
     0x200 - Start charging (enable current flow)
     0x201 - Stop charging (set current to 0)
     0x210 - Set current limit
     """
-    print("🔌 Charger Module: Listening for CAN commands...")
-    while True:
-        msg = bus.recv(timeout=0.1)
-        if not msg:
-            continue
+    if msg.arbitration_id == 0x200:
+        # Start charging command
+        state["running"] = True
+        state["target"] = state["limit"]
+        print(f"✅ START command received. Target current: {state['limit']}A")
 
-        if msg.arbitration_id == 0x200:
-            # Start charging command
-            state["running"] = True
+    elif msg.arbitration_id == 0x201:
+        # Stop charging command
+        state["running"] = False
+        state["target"] = 0
+        print(f"🛑 STOP command received. Ramping down to 0A")
+
+    elif msg.arbitration_id == 0x210:
+        # Set current limit command
+        new_limit = msg.data[0] if len(msg.data) > 0 else 0
+        state["limit"] = new_limit
+        if state["running"]:
             state["target"] = state["limit"]
-            print(f"✅ START command received. Target current: {state['limit']}A")
+        print(f"⚡ Current limit set to: {new_limit}A (running={state['running']})")
 
-        elif msg.arbitration_id == 0x201:
-            # Stop charging command
-            state["running"] = False
-            state["target"] = 0
-            print(f"🛑 STOP command received. Ramping down to 0A")
+class CmdListener(can.Listener):
+    """Notifier callback: the reader thread blocks in the bus until a frame arrives"""
+    def on_message_received(self, msg):
+        _dispatch(msg)
 
-        elif msg.arbitration_id == 0x210:
-            # Set current limit command
-            new_limit = msg.data[0] if len(msg.data) > 0 else 0
-            state["limit"] = new_limit
-            if state["running"]:
-                state["target"] = state["limit"]
-            print(f"⚡ Current limit set to: {new_limit}A (running={state['running']})")
+def start_rx():
+    """Start listening for CAN commands (no recv/timeout polling loop)"""
+    print("🔌 Charger Module: Listening for CAN commands...")
+    return can.Notifier(bus, [CmdListener()])
 
 def tx_loop():
     """
     Transmit loop: Publish current readings on 0x300
     Smoothly ramp current towards target value
-    Also write to shared file for direct plotting
+    Also write the shared JSON snapshot for direct plotting
     """
     print("📡 Charger Module: Publishing current readings on CAN ID 0x300...")
-    DATA_FILE = "/tmp/ev_current.json"
-    import json
+    
+    # 0x300 is transmitted every 100ms by a periodic task (kernel BCM on SocketCAN);
+    # this loop only ramps the value and updates the payload when it changes
+    CURRENT_U16.pack_into(_CAN_BUF, 0, 0)
+    task = bus.send_periodic(_CURRENT_MSG, 0.1)
+    last_sent = 0
     
     while True:
         # Smooth ramping: move 20% towards target each iteration
         state["current"] += (state["target"] - state["current"]) * 0.2
-        current = int(max(0, round(state["current"])))
+        current = max(0, min(0xFFFF, int(round(state["current"]))))
         
-        # Send current reading on CAN - STANDARDIZED ENCODING
-        msg = can.Message(
-            arbitration_id=0x300,
-            data=[current & 0xFF, (current >> 8) & 0xFF],
-            is_extended_id=False
-        )
-        bus.send(msg)
+        # Update periodic CAN payload - STANDARDIZED ENCODING (uint16 little-endian)
+        if current != last_sent:
+            CURRENT_U16.pack_into(_CAN_BUF, 0, current)
+            task.modify_data(_CURRENT_MSG)
+            last_sent = current
         print(f"SENT: {current}")
         
-        # ALSO write to shared file for plotter
-        with open(DATA_FILE, 'w') as f:
+        # ALSO keep latest-value JSON snapshot for existing plotters (atomic swap,
+        # so readers never see a half-written file)
+        with open(TMP_FILE, 'w') as f:
             json.dump({"timestamp": time.time(), "current": current}, f)
+        os.replace(TMP_FILE, DATA_FILE)
         
-        time.sleep(0.1)  # Send every 100ms for smooth plotting
+        time.sleep(0.1)  # Ramp step / snapshot every 100ms
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -90,8 +113,8 @@ if __name__ == "__main__":
     print(f"Initial state: {state}")
     print()
     
-    # Start receiver thread
-    threading.Thread(target=rx_loop, daemon=True).start()
+    # Start CAN command receiver
+    notifier = start_rx()
     
     # Run transmitter in main thread
     tx_loop()
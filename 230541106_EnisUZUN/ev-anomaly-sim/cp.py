@@ -7,11 +7,12 @@ Maps RemoteStart/Stop and SetChargingProfile to CAN bus messages.
 🧠 Enhanced with MemoryBank: Records CAN messages and OCPP transactions
 """
 import asyncio
-import datetime
 import websockets
 import can
 import time
-import json
+import orjson
+import os
+import struct
 from ocpp.v16 import ChargePoint as CP
 from ocpp.v16 import call, call_result
 from ocpp.routing import on
@@ -19,21 +20,52 @@ from ocpp.v16.enums import (
     Action, 
     Measurand, 
     UnitOfMeasure, 
-    AuthorizationStatus, 
-    RegistrationStatus,
     RemoteStartStopStatus,
     ChargingProfileStatus
 )
 from memory_bank import MemoryBank
+from iso_time import utc_iso
+from shared_current import CurrentWriter, CurrentPublisher
 
-# Initialize MemoryBank
-memory = MemoryBank("ev_charging_memory.db")
+# Also write /tmp/ev_current.json (the plotters still read it); EV_CURRENT_JSON=0 disables
+WRITE_JSON_COMPAT = os.environ.get("EV_CURRENT_JSON", "1") == "1"
+# Per-frame console output (one print per 0x300 frame); CP_DEBUG=1 enables
+DEBUG = os.environ.get("CP_DEBUG", "0") == "1"
+DATA_FILE = "/tmp/ev_current.json"
+# Fixed record width: space padding (valid trailing JSON whitespace) keeps the
+# file size constant, so each tick is a single pwrite and never a truncate
+JSON_RECORD_LEN = 64
+
+# Prebuilt CAN commands: START/STOP carry no data, SET_LIMIT packs the limit into
+# _LIMIT_BUF in place (python-can keeps a bytearray by reference and copies it at send time)
+START_MSG = can.Message(arbitration_id=0x200, data=b'', is_extended_id=False)
+STOP_MSG = can.Message(arbitration_id=0x201, data=b'', is_extended_id=False)
+LIMIT_U16 = struct.Struct("<H")
+_LIMIT_BUF = bytearray(2)
+LIMIT_MSG = can.Message(arbitration_id=0x210, data=_LIMIT_BUF, is_extended_id=False)
+
+# MeterValues batching: one OCPP call per METER_BATCH_MAX readings or METER_FLUSH_SEC
+METER_BATCH_MAX = 10
+METER_FLUSH_SEC = 1.0
+
+# Initialize MemoryBank (events/metrics are written in batches by a background thread)
+memory = MemoryBank("ev_charging_memory.db", batch_writes=True)
 
 class ChargePoint(CP):
+    # The ocpp base class keeps its own __dict__; slots cover the attributes added here
+    __slots__ = ("bus", "transaction_id", "_pending", "_send_tasks", "_json_fd", "_json_len")
+
     def __init__(self, id, ws, bus):
         super().__init__(id, ws)
         self.bus = bus
         self.transaction_id = None
+        self._pending = []
+        self._send_tasks = set()
+        self._json_fd = None
+        self._json_len = 0
+        if WRITE_JSON_COMPAT:
+            # Kept open for the whole run instead of open/truncate/close per frame
+            self._json_fd = os.open(DATA_FILE, os.O_WRONLY | os.O_CREAT, 0o644)
 
     async def send_boot(self):
         """Send BootNotification to CSMS"""
@@ -62,12 +94,7 @@ class ChargePoint(CP):
         )
         
         # Send START command via CAN
-        msg = can.Message(
-            arbitration_id=0x200,
-            data=[],
-            is_extended_id=False
-        )
-        self.bus.send(msg)
+        self.bus.send(START_MSG)
         print("📤 CAN: Sent START command (0x200)")
         
         # Log CAN message
@@ -104,12 +131,7 @@ class ChargePoint(CP):
         )
         
         # Send STOP command via CAN
-        msg = can.Message(
-            arbitration_id=0x201,
-            data=[],
-            is_extended_id=False
-        )
-        self.bus.send(msg)
+        self.bus.send(STOP_MSG)
         print("📤 CAN: Sent STOP command (0x201)")
         
         # Log CAN message
@@ -156,12 +178,8 @@ class ChargePoint(CP):
                 )
                 
                 # Send SET LIMIT command via CAN
-                msg = can.Message(
-                    arbitration_id=0x210,
-                    data=[limit & 0xFF, (limit >> 8) & 0xFF],
-                    is_extended_id=False
-                )
-                self.bus.send(msg)
+                LIMIT_U16.pack_into(_LIMIT_BUF, 0, limit & 0xFFFF)
+                self.bus.send(LIMIT_MSG)
                 print(f"📤 CAN: Sent SET_LIMIT command (0x210) with value {limit}A")
                 
                 # Log CAN message
@@ -181,25 +199,63 @@ class ChargePoint(CP):
                 status=ChargingProfileStatus.rejected
             )
 
-    async def meter_loop(self):
+    def _flush_meter_values(self):
+        """Send pending readings as one MeterValues call without blocking the CAN loop"""
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._send_meter_values(batch))
+        self._send_tasks.add(task)
+        task.add_done_callback(self._send_tasks.discard)
+
+    async def _send_meter_values(self, batch):
+        try:
+            await self.call(call.MeterValuesPayload(
+                connector_id=1,
+                meter_value=batch
+            ))
+            print(f"📨 MeterValues sent to CSMS: {len(batch)} reading(s), last {batch[-1]['sampledValue'][0]['value']}A")
+        except Exception as e:
+            print(f"⚠️  Error sending MeterValues: {e}")
+
+    def _write_json(self, ts, current):
+        """Rewrite the legacy JSON file in place"""
+        payload = orjson.dumps({"timestamp": ts, "current": current}).ljust(JSON_RECORD_LEN)
+        os.pwrite(self._json_fd, payload, 0)
+        if len(payload) != self._json_len:
+            os.ftruncate(self._json_fd, len(payload))
+            self._json_len = len(payload)
+
+    async def meter_loop(self, reader):
         """
         Read CAN 0x300 (current readings) and send MeterValues to CSMS
+        Frames arrive through a can.AsyncBufferedReader, so the event loop is never
+        blocked waiting on the bus
         """
         print("📊 Starting MeterValues reporting loop...")
-        DATA_FILE = "/tmp/ev_current.json"
+        shm = CurrentWriter()
+        push = CurrentPublisher()
+        last_flush = time.monotonic()
         
         while True:
             try:
-                msg = self.bus.recv(timeout=0.5)
-                if msg and msg.arbitration_id == 0x300:
+                try:
+                    msg = await asyncio.wait_for(reader.get_message(), timeout=METER_FLUSH_SEC)
+                except asyncio.TimeoutError:
+                    msg = None  # no frame: still give the batch flush a chance
+                if msg is not None and msg.arbitration_id == 0x300:
                     # Parse current value from CAN message
                     current = msg.data[0] + (msg.data[1] << 8) if len(msg.data) >= 2 else 0
                     
-                    print(f"RECEIVED: {current}")
+                    if DEBUG:
+                        print(f"RECEIVED: {current}")
+                    
+                    # Publish to shared memory and push to subscribed readers (collector / live detector)
+                    ts = time.time()
+                    shm.publish(ts, current)
+                    push.publish(ts, current)
                     
-                    # Write to shared file for plotter
-                    with open(DATA_FILE, 'w') as f:
-                        json.dump({"timestamp": time.time(), "current": current}, f)
+                    # Legacy shared file for plotter
+                    if self._json_fd is not None:
+                        self._write_json(ts, current)
                     
                     # Log CAN RX and record metric to MemoryBank
                     memory.log_event(
@@ -210,23 +266,22 @@ class ChargePoint(CP):
                     )
                     memory.record_metric("current", float(current), "A")
                     
-                    # Send MeterValues to CSMS
-                    await self.call(call.MeterValuesPayload(
-                        connector_id=1,
-                        meter_value=[{
-                            "timestamp": datetime.datetime.utcnow().isoformat(),
-                            "sampledValue": [{
-                                "measurand": Measurand.current_import,
-                                "unit": UnitOfMeasure.amp,
-                                "value": str(current)
-                            }]
+                    # Queue reading for the next MeterValues batch
+                    self._pending.append({
+                        "timestamp": utc_iso(ts),
+                        "sampledValue": [{
+                            "measurand": Measurand.current_import,
+                            "unit": UnitOfMeasure.amp,
+                            "value": str(current)
                         }]
-                    ))
-                    print(f"� MeterValues sent to CSMS: {current}A")
+                    })
+                
+                now = time.monotonic()
+                if self._pending and (len(self._pending) >= METER_BATCH_MAX or now - last_flush >= METER_FLUSH_SEC):
+                    self._flush_meter_values()
+                    last_flush = now
             except Exception as e:
                 print(f"⚠️  Error in meter loop: {e}")
-            
-            await asyncio.sleep(0.1)
 
 async def main():
     print("=" * 60)
@@ -238,11 +293,16 @@ async def main():
     bus = can.interface.Bus(bustype="virtual", channel="vcan0", bitrate=500000)
     print("✅ CAN bus connected")
     
+    # Deliver CAN frames into the event loop instead of polling bus.recv()
+    reader = can.AsyncBufferedReader()
+    notifier = can.Notifier(bus, [reader], loop=asyncio.get_running_loop())
+    
     # Connect to CSMS WebSocket
     print("🔗 Connecting to CSMS at ws://127.0.0.1:9000/CP1...")
     ws = await websockets.connect(
         "ws://127.0.0.1:9000/CP1", 
-        subprotocols=["ocpp1.6"]
+        subprotocols=["ocpp1.6"],
+        compression=None  # OCPP frames are a few hundred bytes: skip per-message deflate
     )
     print("✅ WebSocket connected")
     
@@ -253,7 +313,7 @@ async def main():
     await cp.send_boot()
     
     # Start meter reading loop
-    asyncio.create_task(cp.meter_loop())
+    asyncio.create_task(cp.meter_loop(reader))
     
     # Start OCPP message handling
     print("🎯 Charge Point ready. Waiting for OCPP commands...")
@@ -261,4 +321,11 @@ async def main():
     await cp.start()
 
 if __name__ == "__main__":
+    # Use uvloop's libuv event loop when installed (default loop otherwise)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
     asyncio.run(main())
@@ -7,21 +7,74 @@ Periodically sends SetChargingProfile commands to simulate current fluctuations.
 🧠 Enhanced with MemoryBank: Records all OCPP events and anomaly patterns
 """
 import asyncio
-import datetime
+import time
+from collections import Counter
 import websockets
 from ocpp.v16 import ChargePoint as CP
 from ocpp.v16 import call, call_result
 from ocpp.routing import on
 from ocpp.v16.enums import RegistrationStatus, Action
 from memory_bank import MemoryBank
+from iso_time import utc_iso
 
 # Store connected charge points
 CPs = {}
 
+# Fixed charging profiles used by every anomaly cycle (built once, sent by reference)
+_PROFILE_0A = {
+    "chargingProfileId": 7,
+    "stackLevel": 0,
+    "chargingProfilePurpose": "TxProfile",
+    "chargingProfileKind": "Absolute",
+    "chargingSchedule": {
+        "chargingRateUnit": "A",
+        "chargingSchedulePeriod": [{"startPeriod": 0, "limit": 0}]
+    }
+}
+
+_PROFILE_100A = {
+    "chargingProfileId": 8,
+    "stackLevel": 0,
+    "chargingProfilePurpose": "TxProfile",
+    "chargingProfileKind": "Absolute",
+    "chargingSchedule": {
+        "chargingRateUnit": "A",
+        "chargingSchedulePeriod": [{"startPeriod": 0, "limit": 100}]
+    }
+}
+
 # Initialize MemoryBank
 memory = MemoryBank("ev_charging_memory.db")
 
+class TokenBucket:
+    """Leaky/token bucket: allows `rate` operations per second with bursts up to `burst`"""
+    __slots__ = ("rate", "burst", "tokens", "last")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+
+    def consume(self, n=1):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens < n:
+            return False
+        self.tokens -= n
+        return True
+
 class CentralSystem(CP):
+    # The ocpp base class keeps its own __dict__; slots cover the attributes added here
+    __slots__ = ("_mv_bucket", "_mv_dropped")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Per-connection MeterValues limit so one bursty CP cannot starve the others
+        self._mv_bucket = TokenBucket(rate=50, burst=100)
+        self._mv_dropped = 0
+
     @on(Action.BootNotification)
     async def on_boot_notification(self, charge_point_model, charge_point_vendor, **kwargs):
         """Handle BootNotification from charge point"""
@@ -45,7 +98,7 @@ class CentralSystem(CP):
         )
         
         return call_result.BootNotificationPayload(
-            current_time=datetime.datetime.utcnow().isoformat(),
+            current_time=utc_iso(),
             interval=10,
             status=RegistrationStatus.accepted
         )
@@ -53,13 +106,22 @@ class CentralSystem(CP):
     @on(Action.MeterValues)
     async def on_meter_values(self, connector_id, meter_value, **kwargs):
         """Handle MeterValues from charge point"""
+        if not self._mv_bucket.consume():
+            self._mv_dropped += 1
+            if self._mv_dropped % 100 == 1:
+                print(f"⚠️  MeterValues rate limit exceeded for {self.id} ({self._mv_dropped} dropped)")
+            return call_result.MeterValuesPayload()
+        
+        counts = Counter()
+        last_value = {}
         try:
             for mv in meter_value:
                 for sample in mv.get("sampledValue", []):
                     value = sample.get("value", "0")
                     measurand = sample.get("measurand", "unknown")
                     unit = sample.get("unit", "")
-                    print(f"📊 MeterValues from {self.id}: {value}{unit} ({measurand})")
+                    counts[(measurand, unit)] += 1
+                    last_value[(measurand, unit)] = value
                     
                     # Record metric to MemoryBank
                     try:
@@ -75,8 +137,104 @@ class CentralSystem(CP):
         except Exception as e:
             print(f"⚠️  Error parsing MeterValues: {e}")
         
+        # One summary line per (measurand, unit) instead of one per sample
+        for (measurand, unit), n in counts.items():
+            suffix = f" x{n}" if n > 1 else ""
+            print(f"📊 MeterValues from {self.id}: {last_value[(measurand, unit)]}{unit} ({measurand}){suffix}")
+        
         return call_result.MeterValuesPayload()
 
+async def _run_cycle(cp_id, cp, cycle):
+    """One anomaly cycle (0A → 100A → Start → Stop) for a single charge point"""
+    try:
+        # Step 1: Set charging profile to 0A (restrict current)
+        print(f"📉 [{cp_id}] Setting current limit to 0A...")
+        await cp.call(call.SetChargingProfilePayload(
+            connector_id=1,
+            cs_charging_profiles=_PROFILE_0A
+        ))
+        
+        memory.log_event(
+            "OCPP_COMMAND",
+            "CSMS",
+            f"SetChargingProfile(0A) sent to {cp_id}",
+            {"cp_id": cp_id, "limit": 0, "unit": "A"}
+        )
+        
+        await asyncio.sleep(2)
+        
+        # Step 2: Set charging profile to 100A (allow high current)
+        print(f"📈 [{cp_id}] Setting current limit to 100A...")
+        await cp.call(call.SetChargingProfilePayload(
+            connector_id=1,
+            cs_charging_profiles=_PROFILE_100A
+        ))
+        
+        memory.log_event(
+            "OCPP_COMMAND",
+            "CSMS",
+            f"SetChargingProfile(100A) sent to {cp_id}",
+            {"cp_id": cp_id, "limit": 100, "unit": "A"}
+        )
+        
+        # Record anomaly pattern: rapid limit change
+        memory.record_anomaly(
+            "CURRENT_LIMIT_FLUCTUATION",
+            "HIGH",
+            f"Rapid charging limit change: 0A → 100A in cycle {cycle}",
+            {
+                "cycle": cycle,
+                "cp_id": cp_id,
+                "min_limit": 0,
+                "max_limit": 100,
+                "change_rate": "instant"
+            },
+            current_value=100.0,
+            expected_value=32.0
+        )
+        
+        await asyncio.sleep(1)
+        
+        # Step 3: Start transaction
+        print(f"🚀 [{cp_id}] Sending RemoteStartTransaction...")
+        await cp.call(call.RemoteStartTransactionPayload(
+            id_tag="ANOM_TEST",
+            connector_id=1
+        ))
+        
+        memory.log_event(
+            "OCPP_COMMAND",
+            "CSMS",
+            f"RemoteStartTransaction sent to {cp_id}",
+            {"cp_id": cp_id, "id_tag": "ANOM_TEST"}
+        )
+        
+        await asyncio.sleep(2)
+        
+        # Step 4: Stop transaction
+        print(f"🛑 [{cp_id}] Sending RemoteStopTransaction...")
+        await cp.call(call.RemoteStopTransactionPayload(
+            transaction_id=1
+        ))
+        
+        memory.log_event(
+            "OCPP_COMMAND",
+            "CSMS",
+            f"RemoteStopTransaction sent to {cp_id}",
+            {"cp_id": cp_id, "transaction_id": 1}
+        )
+        
+        print()
+        
+    except Exception as e:
+        print(f"❌ Error sending commands to {cp_id}: {e}")
+        memory.log_event(
+            "ERROR",
+            "CSMS",
+            f"Error in anomaly cycle for {cp_id}: {str(e)}",
+            {"cp_id": cp_id, "cycle": cycle, "error": str(e)}
+        )
+
 async def send_anomaly():
     """
     Orchestrate the anomaly scenario:
@@ -114,113 +272,11 @@ async def send_anomaly():
             {"cycle": cycle, "connected_cps": list(CPs.keys())}
         )
         
-        for cp_id, cp in list(CPs.items()):
-            try:
-                # Step 1: Set charging profile to 0A (restrict current)
-                print(f"📉 [{cp_id}] Setting current limit to 0A...")
-                await cp.call(call.SetChargingProfilePayload(
-                    connector_id=1,
-                    cs_charging_profiles={
-                        "chargingProfileId": 7,
-                        "stackLevel": 0,
-                        "chargingProfilePurpose": "TxProfile",
-                        "chargingProfileKind": "Absolute",
-                        "chargingSchedule": {
-                            "chargingRateUnit": "A",
-                            "chargingSchedulePeriod": [{"startPeriod": 0, "limit": 0}]
-                        }
-                    }
-                ))
-                
-                memory.log_event(
-                    "OCPP_COMMAND",
-                    "CSMS",
-                    f"SetChargingProfile(0A) sent to {cp_id}",
-                    {"cp_id": cp_id, "limit": 0, "unit": "A"}
-                )
-                
-                await asyncio.sleep(2)
-                
-                # Step 2: Set charging profile to 100A (allow high current)
-                print(f"📈 [{cp_id}] Setting current limit to 100A...")
-                await cp.call(call.SetChargingProfilePayload(
-                    connector_id=1,
-                    cs_charging_profiles={
-                        "chargingProfileId": 8,
-                        "stackLevel": 0,
-                        "chargingProfilePurpose": "TxProfile",
-                        "chargingProfileKind": "Absolute",
-                        "chargingSchedule": {
-                            "chargingRateUnit": "A",
-                            "chargingSchedulePeriod": [{"startPeriod": 0, "limit": 100}]
-                        }
-                    }
-                ))
-                
-                memory.log_event(
-                    "OCPP_COMMAND",
-                    "CSMS",
-                    f"SetChargingProfile(100A) sent to {cp_id}",
-                    {"cp_id": cp_id, "limit": 100, "unit": "A"}
-                )
-                
-                # Record anomaly pattern: rapid limit change
-                memory.record_anomaly(
-                    "CURRENT_LIMIT_FLUCTUATION",
-                    "HIGH",
-                    f"Rapid charging limit change: 0A → 100A in cycle {cycle}",
-                    {
-                        "cycle": cycle,
-                        "cp_id": cp_id,
-                        "min_limit": 0,
-                        "max_limit": 100,
-                        "change_rate": "instant"
-                    },
-                    current_value=100.0,
-                    expected_value=32.0
-                )
-                
-                await asyncio.sleep(1)
-                
-                # Step 3: Start transaction
-                print(f"🚀 [{cp_id}] Sending RemoteStartTransaction...")
-                await cp.call(call.RemoteStartTransactionPayload(
-                    id_tag="ANOM_TEST",
-                    connector_id=1
-                ))
-                
-                memory.log_event(
-                    "OCPP_COMMAND",
-                    "CSMS",
-                    f"RemoteStartTransaction sent to {cp_id}",
-                    {"cp_id": cp_id, "id_tag": "ANOM_TEST"}
-                )
-                
-                await asyncio.sleep(2)
-                
-                # Step 4: Stop transaction
-                print(f"🛑 [{cp_id}] Sending RemoteStopTransaction...")
-                await cp.call(call.RemoteStopTransactionPayload(
-                    transaction_id=1
-                ))
-                
-                memory.log_event(
-                    "OCPP_COMMAND",
-                    "CSMS",
-                    f"RemoteStopTransaction sent to {cp_id}",
-                    {"cp_id": cp_id, "transaction_id": 1}
-                )
-                
-                print()
-                
-            except Exception as e:
-                print(f"❌ Error sending commands to {cp_id}: {e}")
-                memory.log_event(
-                    "ERROR",
-                    "CSMS",
-                    f"Error in anomaly cycle for {cp_id}: {str(e)}",
-                    {"cp_id": cp_id, "cycle": cycle, "error": str(e)}
-                )
+        # Run the per-CP command sequence concurrently; one failing CP doesn't stop the others
+        await asyncio.gather(
+            *(_run_cycle(cp_id, cp, cycle) for cp_id, cp in list(CPs.items())),
+            return_exceptions=True
+        )
         
         # Record anomaly pattern in pattern learning
         memory.record_pattern(
@@ -273,7 +329,8 @@ async def main():
         handler, 
         "127.0.0.1", 
         9000, 
-        subprotocols=["ocpp1.6"]
+        subprotocols=["ocpp1.6"],
+        compression=None  # OCPP frames are a few hundred bytes: skip per-message deflate
     )
     
     print("✅ CSMS WebSocket server running on ws://127.0.0.1:9000/")
@@ -287,4 +344,11 @@ async def main():
     await server.wait_closed()
 
 if __name__ == "__main__":
+    # Use uvloop's libuv event loop when installed (default loop otherwise)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
     asyncio.run(main())
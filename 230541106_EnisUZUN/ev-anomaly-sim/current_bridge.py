@@ -5,7 +5,8 @@ Reads from charger_module CAN bus and writes to shared file
 Other processes can read from this file
 """
 import can
-import json
+import orjson
+import os
 import time
 
 # CAN bus for receiving from charger
@@ -13,6 +14,16 @@ bus_rx = can.interface.Bus(bustype="virtual", channel="vcan0", bitrate=500000)
 
 # Shared data file
 DATA_FILE = "/tmp/ev_current.json"
+# Not shared with the other DATA_FILE writers (pid suffix)
+TMP_FILE = f"{DATA_FILE}.{os.getpid()}.tmp"
+
+
+def write_current(timestamp, current):
+    """Write reading to a temp file and atomically swap it in (no torn reads)"""
+    with open(TMP_FILE, 'wb') as f:
+        f.write(orjson.dumps({"timestamp": timestamp, "current": current}))
+    os.replace(TMP_FILE, DATA_FILE)
+
 
 print("=" * 60)
 print("🌉 CAN Current Bridge Starting...")
@@ -22,18 +33,12 @@ print(f"Writing to: {DATA_FILE}")
 print()
 
 # Initialize file
-with open(DATA_FILE, 'w') as f:
-    json.dump({"timestamp": 0, "current": 0}, f)
+write_current(0, 0)
 
 while True:
     msg = bus_rx.recv(timeout=0.5)
     if msg and msg.arbitration_id == 0x300:
         if len(msg.data) >= 2:
             current = msg.data[0] + (msg.data[1] << 8)
-            data = {
-                "timestamp": time.time(),
-                "current": current
-            }
-            with open(DATA_FILE, 'w') as f:
-                json.dump(data, f)
+            write_current(time.time(), current)
             print(f"📊 BRIDGE: {current}A")
@@ -3,61 +3,66 @@
 Data Collector for ML Training
 Reads current data and saves to CSV with labels for training
 """
-import json
+import orjson
 import time
 import csv
 import os
-from collections import deque
+import numpy as np
+from shared_current import CurrentSubscriber, open_reader, read_current
 
 DATA_FILE = "/tmp/ev_current.json"
 OUTPUT_CSV = "training_data.csv"
+FIELDNAMES = ('timestamp', 'current', 'current_change', 'moving_avg_5',
+              'moving_avg_10', 'std_dev', 'max_last_10', 'min_last_10',
+              'range_last_10', 'label')
+CSV_FLUSH_ROWS = 50  # flush the buffered CSV every N rows
+COLLECT_NS = 90 * 1_000_000_000  # collection length (monotonic clock, integer ns)
 
-# Keep history for feature extraction
-history = deque(maxlen=100)  # Last 10 seconds (100 * 0.1s)
+# Keep history for feature extraction: preallocated ring buffer
+HISTORY_LEN = 100  # Last 10 seconds (100 * 0.1s)
+_buf = np.zeros(HISTORY_LEN)
+_idx = 0  # next write position
+_n = 0    # number of valid samples
+
+def _window(k):
+    """Last k samples, oldest first (plain slice unless the window wraps)"""
+    start = _idx - min(k, _n)
+    if start >= 0:
+        return _buf[start:_idx]
+    return np.concatenate((_buf[start:], _buf[:_idx]))
 
 def calculate_features(current_value):
-    """Calculate features from current value and history"""
-    history.append(current_value)
+    """
+    Calculate features from current value and history
+    Returns a tuple in FIELDNAMES order (current .. range_last_10)
+    """
+    global _idx, _n
+    previous = _buf[_idx - 1]
+    _buf[_idx] = current_value
+    _idx = (_idx + 1) % HISTORY_LEN
+    _n = min(_n + 1, HISTORY_LEN)
     
-    if len(history) < 2:
-        return {
-            'current': current_value,
-            'current_change': 0,
-            'moving_avg_5': current_value,
-            'moving_avg_10': current_value,
-            'std_dev': 0,
-            'max_last_10': current_value,
-            'min_last_10': current_value,
-            'range_last_10': 0
-        }
+    if _n < 2:
+        return (current_value, 0, current_value, current_value,
+                0, current_value, current_value, 0)
     
-    # Calculate features
-    recent_10 = list(history)[-10:]
-    recent_5 = list(history)[-5:]
+    # Calculate features (vectorized over the last 10 / 5 samples)
+    recent_10 = _window(10)
+    recent_5 = recent_10[-5:]
     
-    current_change = abs(history[-1] - history[-2])
-    moving_avg_5 = sum(recent_5) / len(recent_5)
-    moving_avg_10 = sum(recent_10) / len(recent_10)
+    current_change = abs(current_value - previous)
+    moving_avg_5 = float(recent_5.mean())
+    moving_avg_10 = float(recent_10.mean())
     
-    # Standard deviation
-    mean = sum(recent_10) / len(recent_10)
-    variance = sum((x - mean) ** 2 for x in recent_10) / len(recent_10)
-    std_dev = variance ** 0.5
+    # Standard deviation (population, as before)
+    std_dev = float(recent_10.std())
     
-    max_val = max(recent_10)
-    min_val = min(recent_10)
+    max_val = float(recent_10.max())
+    min_val = float(recent_10.min())
     range_val = max_val - min_val
     
-    return {
-        'current': current_value,
-        'current_change': current_change,
-        'moving_avg_5': moving_avg_5,
-        'moving_avg_10': moving_avg_10,
-        'std_dev': std_dev,
-        'max_last_10': max_val,
-        'min_last_10': min_val,
-        'range_last_10': range_val
-    }
+    return (current_value, current_change, moving_avg_5, moving_avg_10,
+            std_dev, max_val, min_val, range_val)
 
 def is_anomaly(features):
     """
@@ -68,12 +73,13 @@ def is_anomaly(features):
     # 1. Rapid change (>3A in 0.1s) - daha hassas
     # 2. High standard deviation (>2A) - daha hassas
     # 3. Large range in last 10 readings (>6A) - daha hassas
+    current_change, std_dev, range_last_10 = features[1], features[4], features[7]
     
-    if features['current_change'] > 3:  # 5'ten 3'e düşürdük
+    if current_change > 3:  # 5'ten 3'e düşürdük
         return 1
-    if features['std_dev'] > 2:  # 3'ten 2'ye düşürdük
+    if std_dev > 2:  # 3'ten 2'ye düşürdük
         return 1
-    if features['range_last_10'] > 6:  # 10'dan 6'ya düşürdük
+    if range_last_10 > 6:  # 10'dan 6'ya düşürdük
         return 1
     
     return 0
@@ -91,42 +97,40 @@ def main():
     
     # Create CSV file with headers
     file_exists = os.path.exists(OUTPUT_CSV)
-    csvfile = open(OUTPUT_CSV, 'a', newline='')
-    fieldnames = ['timestamp', 'current', 'current_change', 'moving_avg_5', 
-                  'moving_avg_10', 'std_dev', 'max_last_10', 'min_last_10', 
-                  'range_last_10', 'label']
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    csvfile = open(OUTPUT_CSV, 'a', newline='', buffering=1 << 16)
+    writer = csv.writer(csvfile)
     
     if not file_exists:
-        writer.writeheader()
+        writer.writerow(FIELDNAMES)
         print("✅ CSV file created with headers")
     
-    start_time = time.time()
+    # Frames pushed by cp.py; shared memory or the JSON file when nothing is pushed
+    sub = CurrentSubscriber(timeout=0.1)
+    reader = open_reader()
+    print(f"🔗 Source: push socket, fallback {'shared memory' if reader else DATA_FILE}")
+    
+    start_ns = time.monotonic_ns()
     sample_count = 0
     anomaly_count = 0
     
     try:
-        while time.time() - start_time < 90:  # 90 saniyeye çıkardık
+        while time.monotonic_ns() - start_ns < COLLECT_NS:  # 90 saniyeye çıkardık
             try:
-                with open(DATA_FILE, 'r') as f:
-                    data = json.load(f)
-                    current = data.get('current', 0)
-                    timestamp = data.get('timestamp', time.time())
+                # Waits up to 0.1s for a pushed frame (this also paces the loop)
+                sample = sub.recv()
+                if sample is None:
+                    sample = read_current(reader, DATA_FILE)
+                timestamp, current = sample
                 
                 # Calculate features
                 features = calculate_features(current)
                 label = is_anomaly(features)
                 
-                # Prepare row
-                row = {
-                    'timestamp': timestamp,
-                    **features,
-                    'label': label
-                }
-                
-                # Write to CSV
-                writer.writerow(row)
+                # Write to CSV (columns in FIELDNAMES order)
+                writer.writerow((timestamp, *features, label))
                 sample_count += 1
+                if sample_count % CSV_FLUSH_ROWS == 0:
+                    csvfile.flush()
                 
                 if label == 1:
                     anomaly_count += 1
@@ -135,17 +139,16 @@ def main():
                     if sample_count % 20 == 0:  # Print every 20 normal samples
                         print(f"✅ Sample {sample_count}: {current}A → Normal")
                 
-            except (FileNotFoundError, json.JSONDecodeError):
+            except (FileNotFoundError, orjson.JSONDecodeError):
                 pass
-            
-            time.sleep(0.1)
     
     except KeyboardInterrupt:
         print("\n\n⚠️  Collection interrupted by user")
     
     finally:
+        sub.close()
         csvfile.close()
-        elapsed = time.time() - start_time
+        elapsed = (time.monotonic_ns() - start_ns) / 1e9
         
         print()
         print("=" * 60)
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+ISO Timestamp Helper
+utcnow().isoformat()-style strings for OCPP payloads (csms.py, cp.py),
+reusing the formatted second prefix between calls in the same second.
+"""
+import time
+
+# (second, "YYYY-MM-DDTHH:MM:SS"), replaced as one tuple so concurrent callers
+# never pair a second with another second's prefix
+_prefix = (None, "")
+
+
+def utc_iso(ts=None):
+    """time.time() value (now when omitted) in utcnow().isoformat() format"""
+    global _prefix
+    if ts is None:
+        ts = time.time()
+    sec = int(ts)
+    cached_sec, prefix = _prefix
+    if sec != cached_sec:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+        _prefix = (sec, prefix)
+    return f"{prefix}.{int((ts - sec) * 1_000_000):06d}"
@@ -3,80 +3,149 @@
 Live Anomaly Detector
 Uses trained ML model to detect anomalies in real-time
 """
-import json
-import time
+import orjson
+import os
 import pickle
+import math
 import numpy as np
-from collections import deque
+from shared_current import CurrentSubscriber, open_reader, read_current
+
+# ONNX Runtime is optional: used when train_model.py exported anomaly_model.onnx
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# numba is optional: featscale is compiled when available, plain Python otherwise
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
 
 DATA_FILE = "/tmp/ev_current.json"
 MODEL_FILE = "anomaly_model.pkl"
 SCALER_FILE = "scaler.pkl"
+SCALER_PARAMS_FILE = "scaler_params.npz"
+ONNX_MODEL_FILE = "anomaly_model.onnx"
 PREDICTIONS_FILE = "/tmp/ev_predictions.json"
+HISTORY_LEN = 100
+
+@njit(cache=True)
+def featscale(buf, end, n, mean, inv_scale, out):
+    """
+    Compute the 8 model features from buf[..end) (newest at end-1) and write
+    them already standardized ((x - mean) * inv_scale, as StandardScaler) into out[0]
+    """
+    k10 = min(10, n)
+    k5 = min(5, n)
+    current = buf[end - 1]
+    
+    s10 = 0.0
+    max_val = -math.inf
+    min_val = math.inf
+    for i in range(end - k10, end):
+        v = buf[i]
+        s10 += v
+        if v > max_val:
+            max_val = v
+        if v < min_val:
+            min_val = v
+    s5 = 0.0
+    for i in range(end - k5, end):
+        s5 += buf[i]
+    
+    mean_10 = s10 / k10
+    var = 0.0
+    for i in range(end - k10, end):
+        var += (buf[i] - mean_10) ** 2
+    
+    out[0, 0] = (current - mean[0]) * inv_scale[0]
+    out[0, 1] = (abs(current - buf[end - 2]) - mean[1]) * inv_scale[1]
+    out[0, 2] = (s5 / k5 - mean[2]) * inv_scale[2]
+    out[0, 3] = (mean_10 - mean[3]) * inv_scale[3]
+    out[0, 4] = (math.sqrt(var / k10) - mean[4]) * inv_scale[4]
+    out[0, 5] = (max_val - mean[5]) * inv_scale[5]
+    out[0, 6] = (min_val - mean[6]) * inv_scale[6]
+    out[0, 7] = (max_val - min_val - mean[7]) * inv_scale[7]
 
 class LiveDetector:
+    __slots__ = ("session", "_input_name", "model", "_mean", "_inv_scale", "_features",
+                 "_buf", "_idx", "_n", "total_predictions", "anomaly_detections")
+    
     def __init__(self):
-        # Load model and scaler
         print("🤖 Loading ML model...")
-        with open(MODEL_FILE, 'rb') as f:
-            self.model = pickle.load(f)
-        with open(SCALER_FILE, 'rb') as f:
-            self.scaler = pickle.load(f)
-        print("✅ Model loaded successfully")
+        self.session = None
+        if ort is not None and os.path.exists(ONNX_MODEL_FILE):
+            # Scaler + model in one ONNX graph: featscale only extracts raw features
+            self.session = ort.InferenceSession(ONNX_MODEL_FILE, providers=["CPUExecutionProvider"])
+            self._input_name = self.session.get_inputs()[0].name
+            self._mean = np.zeros(8)
+            self._inv_scale = np.ones(8)
+            self._features = np.empty((1, 8), dtype=np.float32)
+            print("✅ ONNX model loaded successfully")
+        else:
+            # Load model
+            with open(MODEL_FILE, 'rb') as f:
+                self.model = pickle.load(f)
+            
+            # Scaling is fused into featscale; only the fitted constants are needed
+            if os.path.exists(SCALER_PARAMS_FILE):
+                params = np.load(SCALER_PARAMS_FILE)
+                self._mean = params["mean"].astype(np.float64)
+                self._inv_scale = params["inv_scale"].astype(np.float64)
+            else:
+                # Model trained before scaler_params.npz was exported
+                with open(SCALER_FILE, 'rb') as f:
+                    scaler = pickle.load(f)
+                self._mean = np.asarray(scaler.mean_, dtype=np.float64)
+                self._inv_scale = 1.0 / np.asarray(scaler.scale_, dtype=np.float64)
+            print("✅ Model loaded successfully")
+            self._features = np.empty((1, 8))
         
-        # Keep history for feature extraction
-        self.history = deque(maxlen=100)
+        # Keep history for feature extraction: preallocated ring buffer.
+        # Each sample is written twice (idx and idx + HISTORY_LEN), so any
+        # recent window is one contiguous slice, never a copy
+        self._buf = np.zeros(2 * HISTORY_LEN)
+        self._idx = 0  # next write position
+        self._n = 0    # number of valid samples
         
         # Statistics
         self.total_predictions = 0
         self.anomaly_detections = 0
     
     def calculate_features(self, current_value):
-        """Calculate features from current value and history"""
-        self.history.append(current_value)
+        """Append current value to history and return the scaled feature row"""
+        self._buf[self._idx] = current_value
+        self._buf[self._idx + HISTORY_LEN] = current_value
+        self._idx = (self._idx + 1) % HISTORY_LEN
+        self._n = min(self._n + 1, HISTORY_LEN)
         
-        if len(self.history) < 2:
+        if self._n < 2:
             return None
         
-        recent_10 = list(self.history)[-10:]
-        recent_5 = list(self.history)[-5:]
-        
-        current_change = abs(self.history[-1] - self.history[-2])
-        moving_avg_5 = sum(recent_5) / len(recent_5)
-        moving_avg_10 = sum(recent_10) / len(recent_10)
-        
-        mean = sum(recent_10) / len(recent_10)
-        variance = sum((x - mean) ** 2 for x in recent_10) / len(recent_10)
-        std_dev = variance ** 0.5
-        
-        max_val = max(recent_10)
-        min_val = min(recent_10)
-        range_val = max_val - min_val
-        
-        return np.array([[
-            current_value,
-            current_change,
-            moving_avg_5,
-            moving_avg_10,
-            std_dev,
-            max_val,
-            min_val,
-            range_val
-        ]])
+        featscale(self._buf, self._idx + HISTORY_LEN, self._n,
+                  self._mean, self._inv_scale, self._features)
+        return self._features
     
     def predict(self, current_value):
         """Predict if current reading is anomaly"""
-        features = self.calculate_features(current_value)
+        features_scaled = self.calculate_features(current_value)
         
-        if features is None:
+        if features_scaled is None:
             return None, None
         
-        # Scale features
-        features_scaled = self.scaler.transform(features)
-        
-        # Predict
-        prediction = self.model.predict(features_scaled)[0]
-        confidence = self.model.predict_proba(features_scaled)[0]
+        if self.session is not None:
+            # Single ONNX Runtime call returns [labels, probabilities]
+            labels, probabilities = self.session.run(None, {self._input_name: features_scaled})
+            prediction = int(labels[0])
+            confidence = probabilities[0]
+        else:
+            # One predict_proba call; the label is its argmax (same as model.predict)
+            confidence = self.model.predict_proba(features_scaled)[0]
+            prediction = self.model.classes_[confidence.argmax()]
         
         # Update stats
         self.total_predictions += 1
@@ -95,14 +164,18 @@ class LiveDetector:
         print("   Press Ctrl+C to stop")
         print()
         
+        # Frames pushed by cp.py; shared memory or the JSON file when nothing is pushed
+        sub = CurrentSubscriber(timeout=0.1)
+        reader = open_reader()
+        
         try:
             while True:
                 try:
-                    # Read current data
-                    with open(DATA_FILE, 'r') as f:
-                        data = json.load(f)
-                        current = data.get('current', 0)
-                        timestamp = data.get('timestamp', time.time())
+                    # Read current data: waits up to 0.1s for a pushed frame (this also paces the loop)
+                    sample = sub.recv()
+                    if sample is None:
+                        sample = read_current(reader, DATA_FILE)
+                    timestamp, current = sample
                     
                     # Make prediction
                     prediction, confidence = self.predict(current)
@@ -117,8 +190,8 @@ class LiveDetector:
                             'anomaly_rate': self.anomaly_detections / self.total_predictions
                         }
                         
-                        with open(PREDICTIONS_FILE, 'w') as f:
-                            json.dump(prediction_data, f)
+                        with open(PREDICTIONS_FILE, 'wb') as f:
+                            f.write(orjson.dumps(prediction_data))
                         
                         # Display prediction
                         if prediction == 1:
@@ -127,10 +200,8 @@ class LiveDetector:
                             if self.total_predictions % 10 == 0:  # Show every 10th normal
                                 print(f"⚡ {current:3d}A → ✅ Normal  (Confidence: {confidence[0]*100:.1f}%)")
                     
-                except (FileNotFoundError, json.JSONDecodeError):
+                except (FileNotFoundError, orjson.JSONDecodeError):
                     pass
-                
-                time.sleep(0.1)
         
         except KeyboardInterrupt:
             print()
@@ -142,6 +213,9 @@ class LiveDetector:
             print(f"Anomalies detected: {self.anomaly_detections} ({self.anomaly_detections/self.total_predictions*100:.1f}%)")
             print(f"Normal readings: {self.total_predictions - self.anomaly_detections} ({(self.total_predictions-self.anomaly_detections)/self.total_predictions*100:.1f}%)")
             print("=" * 60)
+        
+        finally:
+            sub.close()
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -149,7 +223,6 @@ if __name__ == "__main__":
     print("=" * 60)
     
     # Check if model exists
-    import os
     if not os.path.exists(MODEL_FILE):
         print()
         print("❌ Error: Model not found!")
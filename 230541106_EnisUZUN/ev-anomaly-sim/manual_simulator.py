@@ -5,6 +5,7 @@ Sends CAN commands directly to charger to demonstrate anomaly pattern
 NO OCPP - direct CAN control
 """
 import can
+import struct
 import time
 
 print("=" * 60)
@@ -16,26 +17,27 @@ bus = can.interface.Bus(interface="virtual", channel=0)
 print("✅ CAN bus connected")
 print()
 
+# Prebuilt commands; SET_LIMIT packs the value into _LIMIT_BUF in place
+START_MSG = can.Message(arbitration_id=0x200, data=b'', is_extended_id=False)
+STOP_MSG = can.Message(arbitration_id=0x201, data=b'', is_extended_id=False)
+LIMIT_U16 = struct.Struct("<H")
+_LIMIT_BUF = bytearray(2)
+LIMIT_MSG = can.Message(arbitration_id=0x210, data=_LIMIT_BUF, is_extended_id=False)
+
 def send_start():
     """Send START command (0x200)"""
-    msg = can.Message(arbitration_id=0x200, data=[], is_extended_id=False)
-    bus.send(msg)
+    bus.send(START_MSG)
     print("📤 Sent: START (0x200)")
 
 def send_stop():
     """Send STOP command (0x201)"""
-    msg = can.Message(arbitration_id=0x201, data=[], is_extended_id=False)
-    bus.send(msg)
+    bus.send(STOP_MSG)
     print("📤 Sent: STOP (0x201)")
 
 def send_limit(amps):
     """Send current limit (0x210)"""
-    msg = can.Message(
-        arbitration_id=0x210,
-        data=[amps & 0xFF, (amps >> 8) & 0xFF],
-        is_extended_id=False
-    )
-    bus.send(msg)
+    LIMIT_U16.pack_into(_LIMIT_BUF, 0, amps & 0xFFFF)
+    bus.send(LIMIT_MSG)
     print(f"📤 Sent: SET_LIMIT {amps}A (0x210)")
 
 print("🔄 Starting Anomaly Cycle...")
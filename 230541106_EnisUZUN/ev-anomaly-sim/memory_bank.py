@@ -10,20 +10,229 @@ This module provides a SQLite-based memory system that stores:
 - System statistics and analytics
 
 Features:
-- Thread-safe database operations
+- Thread-safe database operations (one persistent connection per thread)
+- Optional batched writer thread for high-rate events/metrics
 - Automatic schema initialization
-- Time-series event storage
+- Time-series event storage (events/metric samples in daily tables)
+- Compressed metric blocks for past days (compact_metrics)
 - Pattern recognition support
 - Query and analysis utilities
 """
 
 import sqlite3
 import json
+import zlib
+from array import array
+import queue
 import threading
+import atexit
+import time
+import orjson
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Iterator, Callable
 from pathlib import Path
+import concurrent.futures
 import contextlib
+import itertools
+import functools
+import hashlib
+
+# NumPy is optional: get_metric_array / stddev and percentiles in get_metric_statistics
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Batched writes: one executemany + commit per WRITE_BATCH_MAX rows or WRITE_FLUSH_SEC
+WRITE_BATCH_MAX = 500
+WRITE_FLUSH_SEC = 0.1
+
+# Per-connection settings (journal_mode=WAL is stored in the database file and set once
+# in _init_database). WAL keeps memory_bank.db-wal / memory_bank.db-shm files next to
+# the database while it is open; copy all three when moving a live database.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",     # fsync at checkpoints, not on every commit
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",    # 256 MiB
+    "PRAGMA cache_size=-65536",      # 64 MiB
+)
+
+# Projections of the query methods: created_at is never read back
+_EVENT_COLUMNS = "id, timestamp, event_type, component, message"
+_ANOMALY_COLUMNS = ("id, timestamp, anomaly_type, severity, description, pattern_data, "
+                    "current_value, expected_value, deviation")
+
+_INSERT_ANOMALY = """
+    INSERT INTO anomalies (timestamp, anomaly_type, severity, description,
+                           pattern_data, current_value, expected_value, deviation)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Per-minute insert counters (stats_bucket), kept by AFTER INSERT triggers so the
+# dashboard's "last hour" counts read ~60 small rows instead of the timestamp indexes
+_BUCKET_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS trg_{name}_bucket AFTER INSERT ON {name}
+    BEGIN
+        INSERT INTO stats_bucket (minute, {column}) VALUES (CAST(NEW.timestamp / 60 AS INTEGER), 1)
+        ON CONFLICT (minute) DO UPDATE SET {column} = {column} + 1;
+    END
+"""
+
+# Daily partitions: rows go to <base>_YYYYMMDD tables (local day of the row's
+# timestamp) and a UNION ALL view named <base> keeps the old name for queries.
+# Retention drops whole day tables instead of deleting rows.
+_PARTITIONED_TABLES = {
+    "events": {
+        "columns": """
+            id INTEGER PRIMARY KEY,
+            timestamp REAL NOT NULL,
+            event_type TEXT NOT NULL,
+            component TEXT NOT NULL,
+            message TEXT,
+            data BLOB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        """,
+        "insert_columns": ("timestamp", "event_type", "component", "message", "data"),
+        "ts_column": "timestamp",
+        "view_select": "*",
+        # Composite (filter, timestamp DESC) indexes: "filter ... LIMIT n" is a range scan
+        "indexes": ("timestamp", "event_type, timestamp DESC", "component, timestamp DESC"),
+        "triggers": (_BUCKET_TRIGGER.format(name="{name}", column="events"),),
+    },
+    "metric_samples": {
+        "columns": """
+            series_id INTEGER NOT NULL,
+            ts REAL NOT NULL,
+            value REAL NOT NULL
+        """,
+        "insert_columns": ("series_id", "ts", "value"),
+        "ts_column": "ts",
+        "view_select": "rowid AS id, *",
+        # Covering index: per-series range scans and aggregates never touch the table
+        "indexes": ("series_id, ts, value",),
+    },
+}
+
+
+# Day tables number their rows from YYYYMMDD * PARTITION_ID_SPAN, so ids stay
+# unique across the whole view (e.g. 20261016000000001 for that day's first event)
+PARTITION_ID_SPAN = 10 ** 9
+
+
+def _first_id(name: str) -> int:
+    """Id base of the day table <base>_YYYYMMDD (its rows get base + 1, base + 2, ...)."""
+    return int(name[-8:]) * PARTITION_ID_SPAN
+
+
+# Past days' metric samples are packed per series into blocks of up to this many points
+METRIC_BLOCK_SIZE = 512
+
+
+def _encode_block(timestamps: List[float], values: List[float]) -> Tuple[bytes, bytes]:
+    """
+    Gorilla-style block encoding, zlib instead of bit packing:
+    timestamps as delta-of-delta integer microseconds (mostly 0 at a fixed
+    sample rate) and values as the float64 bits XORed with the previous value
+    (mostly 0 bytes while the value repeats or changes slowly).
+    """
+    dod = array('q')
+    prev = prev_delta = 0
+    for ts in timestamps:
+        us = round(ts * 1_000_000)
+        delta = us - prev
+        dod.append(delta - prev_delta)
+        prev, prev_delta = us, delta
+    
+    bits = array('Q')
+    bits.frombytes(array('d', values).tobytes())
+    xor = array('Q')
+    prev = 0
+    for b in bits:
+        xor.append(b ^ prev)
+        prev = b
+    return zlib.compress(dod.tobytes()), zlib.compress(xor.tobytes())
+
+
+def _decode_block(ts_blob: bytes, val_blob: bytes) -> Tuple[List[float], List[float]]:
+    """Inverse of _encode_block: (timestamps, values), oldest first."""
+    dod = array('q')
+    dod.frombytes(zlib.decompress(ts_blob))
+    timestamps = []
+    us = delta = 0
+    for d in dod:
+        delta += d
+        us += delta
+        timestamps.append(us / 1_000_000)
+    
+    xor = array('Q')
+    xor.frombytes(zlib.decompress(val_blob))
+    bits = array('Q')
+    prev = 0
+    for x in xor:
+        prev ^= x
+        bits.append(prev)
+    values = array('d')
+    values.frombytes(bits.tobytes())
+    return timestamps, values.tolist()
+
+
+def _decode_values_np(val_blob: bytes) -> "np.ndarray":
+    """Values of one block as float64 (XOR prefix scan in NumPy)."""
+    xor = np.frombuffer(zlib.decompress(val_blob), dtype=np.uint64)
+    return np.bitwise_xor.accumulate(xor).view(np.float64)
+
+
+def _decode_timestamps_np(ts_blob: bytes) -> "np.ndarray":
+    """Timestamps of one block as float64 seconds (two cumulative sums of the delta-of-delta)."""
+    dod = np.frombuffer(zlib.decompress(ts_blob), dtype=np.int64)
+    return np.cumsum(np.cumsum(dod)) / 1_000_000
+
+
+def _summarize_values(values: "np.ndarray") -> Dict[str, float]:
+    """min/max/avg/count/stddev/p50/p95/p99 of a float64 array (all 0 when empty)."""
+    if not values.size:
+        return {'min': 0, 'max': 0, 'avg': 0, 'count': 0,
+                'stddev': 0, 'p50': 0, 'p95': 0, 'p99': 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'avg': float(values.mean()),
+        'count': int(values.size),
+        'stddev': float(values.std()),
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99)
+    }
+
+
+def _pattern_hash(pattern_json: str) -> bytes:
+    """16-byte key for (pattern_type, pattern) uniqueness instead of comparing JSON text."""
+    return hashlib.blake2b(pattern_json.encode(), digest_size=16).digest()
+
+
+def _noop(conn: sqlite3.Connection):
+    """Mutation that writes nothing (flush barrier for the write queue)."""
+
+
+@functools.lru_cache(maxsize=256)
+def _build_query(table: str, projection: str, columns: Tuple[str, ...], has_since: bool) -> str:
+    """
+    SELECT for one filter combination; the same text every time, so the
+    connection's statement cache returns the already-prepared statement.
+    
+    Args:
+        table: Table name
+        projection: Selected columns ("*" only where every column is needed)
+        columns: Columns filtered by equality, in parameter order
+        has_since: Add a "timestamp >= ?" filter after the columns
+    """
+    query = f"SELECT {projection} FROM {table} WHERE 1=1"
+    for column in columns:
+        query += f" AND {column} = ?"
+    if has_since:
+        query += " AND timestamp >= ?"
+    return query + " ORDER BY timestamp DESC LIMIT ?"
 
 
 class MemoryBank:
@@ -37,44 +246,60 @@ class MemoryBank:
     - Metrics: Performance and statistics
     """
     
-    def __init__(self, db_path: str = "memory_bank.db"):
+    def __init__(self, db_path: str = "memory_bank.db", batch_writes: bool = False):
         """
         Initialize MemoryBank with SQLite database.
         
         Args:
             db_path: Path to SQLite database file
+            batch_writes: Queue log_event/record_metric rows for a background
+                writer thread instead of one INSERT + commit per call; other
+                writes (sessions, patterns, bulk inserts) also run on that
+                thread and wait for their result (committed right away,
+                without waiting out WRITE_FLUSH_SEC)
         """
         self.db_path = db_path
-        self.lock = threading.Lock()
+        self._tls = threading.local()
+        self._conns = []  # every thread's connection, closed by close()
+        self._series_ids: Dict[Tuple[str, str, str], int] = {}  # (name, unit, metadata) -> id
+        self._conns_lock = threading.Lock()
+        self._partitions: Dict[str, List[str]] = {base: [] for base in _PARTITIONED_TABLES}
+        self._day_cache: Dict[str, Tuple[float, float, str]] = {}  # base -> (start, end, INSERT sql)
+        self._partition_lock = threading.Lock()
         self._init_database()
+        
+        self._write_q = None
+        if batch_writes:
+            self._write_q = queue.Queue()
+            threading.Thread(target=self._writer_loop, name="memory-writer",
+                             daemon=True).start()
+            atexit.register(self.flush)
     
     def _init_database(self):
         """Create database schema if it doesn't exist."""
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            # Events table: All system events
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp REAL NOT NULL,
-                    event_type TEXT NOT NULL,
-                    component TEXT NOT NULL,
-                    message TEXT,
-                    data TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            # Write-ahead log: readers no longer block on a writer's commit
+            cursor.execute("PRAGMA journal_mode=WAL")
+            
+            # The whole schema check runs in one write transaction: processes starting
+            # together queue on the busy timeout instead of failing a read -> write upgrade
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # Events table: All system events, partitioned by day (see _PARTITIONED_TABLES)
+            # (ids are plain INTEGER PRIMARY KEY rowids: no AUTOINCREMENT, so inserts
+            # do not also update sqlite_sequence; _insert_sql assigns day-prefixed ids)
             
             # Anomalies table: Detected anomalies
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS anomalies (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id INTEGER PRIMARY KEY,
                     timestamp REAL NOT NULL,
                     anomaly_type TEXT NOT NULL,
                     severity TEXT NOT NULL,
                     description TEXT,
-                    pattern_data TEXT,
+                    pattern_data BLOB,
                     current_value REAL,
                     expected_value REAL,
                     deviation REAL,
@@ -85,7 +310,7 @@ class MemoryBank:
             # Sessions table: Charging sessions
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id INTEGER PRIMARY KEY,
                     session_id TEXT UNIQUE NOT NULL,
                     start_time REAL NOT NULL,
                     end_time REAL,
@@ -99,24 +324,104 @@ class MemoryBank:
                 )
             """)
             
-            # Metrics table: System performance metrics
+            # Metrics: one series row per (name, unit, metadata) and narrow numeric
+            # samples (metric_samples, partitioned by day), so aggregates only read
+            # (series_id, ts, value)
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS metrics (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp REAL NOT NULL,
-                    metric_name TEXT NOT NULL,
-                    metric_value REAL NOT NULL,
-                    unit TEXT,
-                    metadata TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                CREATE TABLE IF NOT EXISTS metric_series (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    unit TEXT NOT NULL DEFAULT '',
+                    metadata TEXT NOT NULL DEFAULT '',
+                    UNIQUE (name, unit, metadata)
                 )
             """)
             
+            # Compressed samples of past days (see compact_metrics); min/max/sum/n
+            # answer statistics without decoding the blobs
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS metric_blocks (
+                    series_id INTEGER NOT NULL,
+                    start_ts REAL NOT NULL,
+                    end_ts REAL NOT NULL,
+                    n INTEGER NOT NULL,
+                    min_value REAL NOT NULL,
+                    max_value REAL NOT NULL,
+                    sum_value REAL NOT NULL,
+                    ts_blob BLOB NOT NULL,
+                    val_blob BLOB NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_metric_blocks_series_end ON metric_blocks(series_id, end_ts)")
+            
+            # Databases from before the split: move the wide metrics rows over
+            # (into a plain metric_samples table, split into days below)
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'metrics'")
+            if cursor.fetchone():
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS metric_samples ({_PARTITIONED_TABLES['metric_samples']['columns']})")
+                cursor.execute("""
+                    INSERT OR IGNORE INTO metric_series (name, unit, metadata)
+                    SELECT DISTINCT metric_name, COALESCE(unit, ''), COALESCE(metadata, '')
+                    FROM metrics
+                """)
+                cursor.execute("""
+                    INSERT INTO metric_samples (series_id, ts, value)
+                    SELECT s.id, m.timestamp, m.metric_value
+                    FROM metrics m JOIN metric_series s
+                      ON s.name = m.metric_name
+                     AND s.unit = COALESCE(m.unit, '')
+                     AND s.metadata = COALESCE(m.metadata, '')
+                """)
+                cursor.execute("DROP TABLE metrics")
+            
+            # Per-minute counters (see _BUCKET_TRIGGER)
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_bucket'")
+            new_buckets = cursor.fetchone() is None
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS stats_bucket (
+                    minute INTEGER PRIMARY KEY,
+                    events INTEGER NOT NULL DEFAULT 0,
+                    anomalies INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute(_BUCKET_TRIGGER.format(name="anomalies", column="anomalies"))
+            
+            # Day tables + views; databases from before partitioning have plain tables
+            for base in _PARTITIONED_TABLES:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (base,))
+                if cursor.fetchone():
+                    self._split_legacy_table(conn, base)
+                self._rebuild_view(conn, base)
+                # Day tables from before day-prefixed ids: move their rows into the day's range
+                for name in self._partitions[base]:
+                    first_id = _first_id(name)
+                    min_id = cursor.execute(f"SELECT MIN(rowid) FROM {name}").fetchone()[0]
+                    if min_id is not None and min_id <= first_id:
+                        cursor.execute(f"UPDATE {name} SET rowid = rowid + ? WHERE rowid <= ?",
+                                       (first_id, first_id))
+            
+            # Day tables created before the triggers existed get them here
+            for name in self._partitions["events"]:
+                self._create_partition(conn, "events", name)
+            if new_buckets:
+                # Count existing rows once (the legacy split above may have fired the triggers)
+                cursor.execute("DELETE FROM stats_bucket")
+                cursor.execute("""
+                    INSERT INTO stats_bucket (minute, events)
+                    SELECT CAST(timestamp / 60 AS INTEGER), COUNT(*) FROM events GROUP BY 1
+                """)
+                cursor.execute("""
+                    INSERT INTO stats_bucket (minute, anomalies)
+                    SELECT CAST(timestamp / 60 AS INTEGER) AS m, COUNT(*) FROM anomalies WHERE true GROUP BY m
+                    ON CONFLICT (minute) DO UPDATE SET anomalies = excluded.anomalies
+                """)
+            
             # Patterns table: Learned patterns
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS patterns (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id INTEGER PRIMARY KEY,
                     pattern_type TEXT NOT NULL,
+                    pattern_hash BLOB NOT NULL,
                     pattern_data TEXT NOT NULL,
                     frequency INTEGER DEFAULT 1,
                     last_seen REAL,
@@ -126,26 +431,293 @@ class MemoryBank:
                 )
             """)
             
+            # Databases created before pattern_hash existed: add and backfill it
+            columns = [row['name'] for row in cursor.execute("PRAGMA table_info(patterns)")]
+            if 'pattern_hash' not in columns:
+                cursor.execute("ALTER TABLE patterns ADD COLUMN pattern_hash BLOB")
+                rows = cursor.execute("SELECT id, pattern_data FROM patterns").fetchall()
+                cursor.executemany(
+                    "UPDATE patterns SET pattern_hash = ? WHERE id = ?",
+                    [(_pattern_hash(row['pattern_data']), row['id']) for row in rows]
+                )
+            # record_pattern's UPSERT target
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_patterns_type_hash ON patterns(pattern_type, pattern_hash)")
+            
             # Create indexes for faster queries
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_anomalies_timestamp ON anomalies(timestamp)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_anomalies_type ON anomalies(anomaly_type)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_start ON sessions(start_time)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_metrics_timestamp ON metrics(timestamp)")
+            
+            # Composite indexes matching the query filters + ORDER BY timestamp DESC,
+            # so "filter ... LIMIT n" is an index range scan instead of scan + sort
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_anomalies_type_sev_ts ON anomalies(anomaly_type, severity, timestamp DESC)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions(status)")
+            
+            # Single-column index covered by the composite above (extra cost on every insert)
+            cursor.execute("DROP INDEX IF EXISTS idx_anomalies_type")
             
             conn.commit()
+            self._analyze(conn)
     
-    @contextlib.contextmanager
-    def _get_connection(self):
-        """Thread-safe database connection context manager."""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
+    def _thread_connection(self, read_only: bool = False) -> sqlite3.Connection:
+        """This thread's long-lived connection (read-write or read-only), opened (with pragmas) on first use."""
+        attr = "ro_conn" if read_only else "conn"
+        conn = getattr(self._tls, attr, None)
+        if conn is None:
+            if read_only:
+                # mode=ro never takes the write lock; under WAL it reads the last
+                # committed snapshot while the writer keeps going
+                conn = sqlite3.connect(Path(self.db_path).resolve().as_uri() + "?mode=ro",
+                                       uri=True, check_same_thread=False, cached_statements=256)
+                conn.execute("PRAGMA query_only=1")
+            else:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                       cached_statements=256)
             conn.row_factory = sqlite3.Row
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            setattr(self._tls, attr, conn)
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+    
+    @staticmethod
+    def _analyze(conn: sqlite3.Connection):
+        """Refresh planner statistics (sampled, so it stays cheap on large databases)."""
+        conn.execute("PRAGMA analysis_limit=1000")
+        conn.execute("ANALYZE")
+        conn.commit()
+    
+    @contextlib.contextmanager
+    def _get_connection(self, read_only: bool = False):
+        """
+        Per-thread database connection context manager.
+        
+        Connections stay open between calls; SQLite's own locking (WAL: many
+        readers, one writer) serializes writers across threads. Query methods
+        pass read_only=True and use the thread's separate read-only connection.
+        """
+        conn = self._thread_connection(read_only)
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+    
+    # ==================== DAILY PARTITIONS ====================
+    
+    def _load_partitions(self, conn: sqlite3.Connection, base: str) -> List[str]:
+        """Day tables of base currently in the database (oldest first), cached on the instance."""
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+            (base + "_" + "[0-9]" * 8,)
+        ).fetchall()
+        self._partitions[base] = sorted(row[0] for row in rows)
+        return self._partitions[base]
+    
+    @staticmethod
+    def _create_partition(conn: sqlite3.Connection, base: str, name: str):
+        """Create one day table of base with its indexes."""
+        spec = _PARTITIONED_TABLES[base]
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {name} ({spec['columns']})")
+        for i, columns in enumerate(spec["indexes"]):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_{i} ON {name}({columns})")
+        for trigger in spec.get("triggers", ()):
+            conn.execute(trigger.format(name=name))
+    
+    @staticmethod
+    def _begin_write(conn: sqlite3.Connection):
+        """
+        Open a write transaction unless one is open. IMMEDIATE takes the write
+        lock up front (waiting on the busy timeout); a deferred BEGIN that reads
+        first fails at once with SQLITE_BUSY when another process wrote meanwhile.
+        """
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+    
+    def _rebuild_view(self, conn: sqlite3.Connection, base: str):
+        """
+        Recreate the base view over every day table, inside the caller's write
+        transaction (readers never miss it; the caller commits). Nothing is
+        written when the view already lists exactly those tables.
+        """
+        self._begin_write(conn)
+        tables = self._load_partitions(conn, base)
+        if not tables:
+            # A UNION ALL view needs at least one table
+            tables = [f"{base}_{datetime.now():%Y%m%d}"]
+            self._create_partition(conn, base, tables[0])
+            self._partitions[base] = tables
+        select = _PARTITIONED_TABLES[base]["view_select"]
+        sql = f"CREATE VIEW {base} AS " + " UNION ALL ".join(
+            f"SELECT {select} FROM {name}" for name in tables)
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?",
+                           (base,)).fetchone()
+        if row is None or row[0] != sql:
+            conn.execute(f"DROP VIEW IF EXISTS {base}")
+            conn.execute(sql)
+    
+    def _split_legacy_table(self, conn: sqlite3.Connection, base: str):
+        """Move the rows of a pre-partitioning base table into day tables and drop it."""
+        ts = _PARTITIONED_TABLES[base]["ts_column"]
+        days = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT date({ts}, 'unixepoch', 'localtime') FROM {base}")]
+        conn.execute(f"ALTER TABLE {base} RENAME TO {base}_legacy")
+        for day in days:
+            start = datetime.strptime(day, "%Y-%m-%d")
+            name = f"{base}_{start:%Y%m%d}"
+            self._create_partition(conn, base, name)
+            conn.execute(
+                f"INSERT INTO {name} SELECT * FROM {base}_legacy WHERE {ts} >= ? AND {ts} < ?",
+                (start.timestamp(), (start + timedelta(days=1)).timestamp())
+            )
+        conn.execute(f"DROP TABLE {base}_legacy")
+    
+    def _insert_sql(self, base: str, ts: float) -> str:
+        """INSERT statement for the day table holding ts (table created on first use)."""
+        start, end, sql = self._day_cache.get(base, (0.0, 0.0, ""))
+        if start <= ts < end:
+            return sql
+        
+        day = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+        name = f"{base}_{day:%Y%m%d}"
+        if name not in self._partitions[base]:
+            with self._partition_lock:
+                self._write(functools.partial(self._ensure_partition, base=base, name=name))
+        
+        # Row ids continue from the table's largest (O(1) on the rowid b-tree),
+        # starting at the day's id base
+        columns = _PARTITIONED_TABLES[base]["insert_columns"]
+        sql = (f"INSERT INTO {name} (rowid, {', '.join(columns)}) "
+               f"VALUES ((SELECT COALESCE(MAX(rowid), {_first_id(name)}) + 1 FROM {name}), "
+               f"{', '.join('?' * len(columns))})")
+        self._day_cache[base] = (day.timestamp(), (day + timedelta(days=1)).timestamp(), sql)
+        return sql
+    
+    def _ensure_partition(self, conn: sqlite3.Connection, base: str, name: str):
+        """Create day table name (and add it to the view) unless another process already did."""
+        if name not in self._load_partitions(conn, base):
+            self._begin_write(conn)
+            self._create_partition(conn, base, name)
+            self._rebuild_view(conn, base)
+    
+    # ==================== BATCHED WRITES ====================
+    
+    def _writer_loop(self):
+        """
+        Drain the write queue: up to WRITE_BATCH_MAX rows or WRITE_FLUSH_SEC per commit.
+        A queued mutation (someone is blocked on its future) ends the batch at once;
+        only fire-and-forget rows wait for the deadline.
+        """
+        q = self._write_q
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + WRITE_FLUSH_SEC
+            while len(batch) < WRITE_BATCH_MAX and not callable(batch[-1][0]):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=timeout))
+                except queue.Empty:
+                    break
             try:
-                yield conn
+                self._write_batch(batch)
+            except Exception as e:
+                # Keep the thread alive: whoever still waits on this batch gets the error
+                for item, future in batch:
+                    if callable(item) and not future.done():
+                        future.set_exception(e)
+                print(f"⚠️  MemoryBank: write batch failed: {e!r}")
             finally:
-                conn.close()
+                for _ in batch:
+                    q.task_done()
+    
+    def _write_batch(self, batch: List[Tuple[Any, Any]]):
+        """
+        Insert queued (sql, params) rows with one executemany per statement;
+        queued (fn, future) mutations from _write run in queue order between them.
+        """
+        grouped: Dict[str, List[tuple]] = {}
+        for item, arg in batch:
+            if callable(item):
+                self._insert_queued(grouped)
+                grouped = {}
+                if arg.set_running_or_notify_cancel():
+                    try:
+                        arg.set_result(self._execute_write(item))
+                    except Exception as e:
+                        arg.set_exception(e)
+            else:
+                grouped.setdefault(item, []).append(arg)
+        self._insert_queued(grouped)
+    
+    def _insert_queued(self, grouped: Dict[str, List[tuple]]):
+        """Write-thread side of _insert: nobody waits on these rows, so errors are reported and dropped."""
+        if not grouped:
+            return
+        try:
+            self._execute_write(functools.partial(self._executemany, grouped=grouped))
+        except Exception as e:
+            print(f"⚠️  MemoryBank: dropped {sum(map(len, grouped.values()))} queued rows: {e!r}")
+    
+    @staticmethod
+    def _executemany(conn: sqlite3.Connection, grouped: Dict[str, List[tuple]]) -> int:
+        """One executemany per statement of {sql: rows}; returns the row count."""
+        for sql, rows in grouped.items():
+            conn.executemany(sql, rows)
+        return sum(len(rows) for rows in grouped.values())
+    
+    def _execute_write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run fn(conn) on this thread's connection and commit (rollback on error)."""
+        # Write paths use the thread connection directly: no context-manager generator per call
+        conn = self._thread_connection()
+        try:
+            result = fn(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return result
+    
+    def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """
+        Run a mutation fn(conn) in its own transaction and return its result.
+        With batch_writes it runs on the writer thread, so every write goes
+        through one connection in queue order (no competing writers);
+        the caller blocks until it is done.
+        """
+        if self._write_q is None:
+            return self._execute_write(fn)
+        future = concurrent.futures.Future()
+        self._write_q.put((fn, future))
+        return future.result()
+    
+    def _insert_many(self, grouped: Dict[str, List[tuple]]) -> int:
+        """Insert {sql: rows} in one transaction (one executemany per statement, one commit)."""
+        return self._write(functools.partial(self._executemany, grouped=grouped))
+    
+    def _insert(self, sql: str, params: tuple) -> Optional[int]:
+        """Queue the row when batching, otherwise insert it now and return its ID."""
+        if self._write_q is not None:
+            self._write_q.put((sql, params))
+            return None
+        
+        # Same as _execute_write, inlined: this is the per-event path without batching
+        conn = self._thread_connection()
+        try:
+            rowid = conn.execute(sql, params).lastrowid
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return rowid
+    
+    def flush(self):
+        """Block until all queued rows are written (no-op without batch_writes)."""
+        if self._write_q is not None and self._write_q.unfinished_tasks:
+            # An empty mutation behind the queued rows: it commits them without
+            # waiting out WRITE_FLUSH_SEC, and the queue is FIFO
+            self._write(_noop)
     
     # ==================== EVENT LOGGING ====================
     
@@ -161,25 +733,36 @@ class MemoryBank:
             data: Additional structured data
         
         Returns:
-            Event ID
+            Event ID (None when batch_writes queued the row)
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            timestamp = datetime.now().timestamp()
-            data_json = json.dumps(data) if data else None
-            
-            cursor.execute("""
-                INSERT INTO events (timestamp, event_type, component, message, data)
-                VALUES (?, ?, ?, ?, ?)
-            """, (timestamp, event_type, component, message, data_json))
-            
-            conn.commit()
-            return cursor.lastrowid
+        timestamp = time.time()
+        data_json = orjson.dumps(data) if data else None
+        
+        return self._insert(self._insert_sql("events", timestamp),
+                            (timestamp, event_type, component, message, data_json))
+    
+    def log_events_bulk(self, rows: List[Tuple[float, str, str, str, Optional[Dict]]]) -> int:
+        """
+        Log many events in a single transaction.
+        
+        Args:
+            rows: (timestamp, event_type, component, message, data) tuples
+        
+        Returns:
+            Number of events written
+        """
+        grouped: Dict[str, List[tuple]] = {}
+        for ts, event_type, component, message, data in rows:
+            grouped.setdefault(self._insert_sql("events", ts), []).append(
+                (ts, event_type, component, message, orjson.dumps(data) if data else None)
+            )
+        return self._insert_many(grouped)
     
     def get_events(self, event_type: Optional[str] = None, 
                    component: Optional[str] = None,
                    since: Optional[datetime] = None,
-                   limit: int = 100) -> List[Dict]:
+                   limit: int = 100, raw_json: bool = False,
+                   include_data: bool = True) -> List[Dict]:
         """
         Query events with optional filters.
         
@@ -188,41 +771,56 @@ class MemoryBank:
             component: Filter by component
             since: Only return events after this time
             limit: Maximum number of events to return
+            raw_json: Leave 'data' as the stored JSON (UTF-8 bytes; str for rows
+                written before it was stored as bytes), for callers that emit JSON
+            include_data: False leaves the 'data' column out of the query entirely
         
         Returns:
             List of event dictionaries
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            query = "SELECT * FROM events WHERE 1=1"
+        projection = _EVENT_COLUMNS + ", data" if include_data else _EVENT_COLUMNS
+        events = []
+        for row in self._iter_events(event_type, component, since, limit, projection):
+            event = dict(row)
+            if include_data and event['data'] and not raw_json:
+                event['data'] = orjson.loads(event['data'])
+            events.append(event)
+        
+        return events
+    
+    def _iter_events(self, event_type: Optional[str] = None,
+                     component: Optional[str] = None,
+                     since: Optional[datetime] = None,
+                     limit: int = 100, projection: str = "*") -> Iterator[sqlite3.Row]:
+        """Event rows for get_events, newest first, streamed off the cursors."""
+        self.flush()
+        with self._get_connection(read_only=True) as conn:
+            columns = []
             params = []
             
             if event_type:
-                query += " AND event_type = ?"
+                columns.append("event_type")
                 params.append(event_type)
             
             if component:
-                query += " AND component = ?"
+                columns.append("component")
                 params.append(component)
             
             if since:
-                query += " AND timestamp >= ?"
                 params.append(since.timestamp())
             
-            query += " ORDER BY timestamp DESC LIMIT ?"
-            params.append(limit)
-            
-            cursor.execute(query, params)
-            
-            events = []
-            for row in cursor.fetchall():
-                event = dict(row)
-                if event['data']:
-                    event['data'] = json.loads(event['data'])
-                events.append(event)
-            
-            return events
+            # Day tables newest first: each holds only older rows than the one before,
+            # so appending per-table results keeps ORDER BY timestamp DESC, and tables
+            # before since's day are never touched
+            first_table = f"events_{since:%Y%m%d}" if since else ""
+            remaining = limit
+            for table in reversed(self._load_partitions(conn, "events")):
+                if table < first_table or remaining <= 0:
+                    break
+                for row in conn.execute(_build_query(table, projection, tuple(columns), bool(since)),
+                                        params + [remaining]):
+                    remaining -= 1
+                    yield row
     
     # ==================== ANOMALY DETECTION ====================
     
@@ -244,29 +842,45 @@ class MemoryBank:
         Returns:
             Anomaly ID
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            timestamp = datetime.now().timestamp()
-            pattern_json = json.dumps(pattern_data) if pattern_data else None
-            
+        timestamp = time.time()
+        pattern_json = orjson.dumps(pattern_data) if pattern_data else None
+        
+        deviation = None
+        if current_value is not None and expected_value is not None:
+            deviation = abs(current_value - expected_value)
+        
+        return self._write(lambda conn: conn.execute(
+            _INSERT_ANOMALY,
+            (timestamp, anomaly_type, severity, description, pattern_json,
+             current_value, expected_value, deviation)
+        ).lastrowid)
+    
+    def record_anomalies_bulk(self, rows: List[Tuple[float, str, str, str, Optional[Dict],
+                                                     Optional[float], Optional[float]]]) -> int:
+        """
+        Record many anomalies in a single transaction.
+        
+        Args:
+            rows: (timestamp, anomaly_type, severity, description, pattern_data,
+                   current_value, expected_value) tuples
+        
+        Returns:
+            Number of anomalies written
+        """
+        params = []
+        for ts, anomaly_type, severity, description, pattern_data, current, expected in rows:
             deviation = None
-            if current_value is not None and expected_value is not None:
-                deviation = abs(current_value - expected_value)
-            
-            cursor.execute("""
-                INSERT INTO anomalies (timestamp, anomaly_type, severity, description,
-                                       pattern_data, current_value, expected_value, deviation)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (timestamp, anomaly_type, severity, description, pattern_json,
-                  current_value, expected_value, deviation))
-            
-            conn.commit()
-            return cursor.lastrowid
+            if current is not None and expected is not None:
+                deviation = abs(current - expected)
+            params.append((ts, anomaly_type, severity, description,
+                           orjson.dumps(pattern_data) if pattern_data else None,
+                           current, expected, deviation))
+        return self._insert_many({_INSERT_ANOMALY: params})
     
     def get_anomalies(self, anomaly_type: Optional[str] = None,
                       severity: Optional[str] = None,
                       since: Optional[datetime] = None,
-                      limit: int = 100) -> List[Dict]:
+                      limit: int = 100, raw_json: bool = False) -> List[Dict]:
         """
         Query anomalies with optional filters.
         
@@ -275,45 +889,47 @@ class MemoryBank:
             severity: Filter by severity level
             since: Only return anomalies after this time
             limit: Maximum number of anomalies to return
+            raw_json: Leave 'pattern_data' as the stored JSON (bytes, or str for older rows)
         
         Returns:
             List of anomaly dictionaries
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            query = "SELECT * FROM anomalies WHERE 1=1"
+        anomalies = []
+        for row in self._iter_anomalies(anomaly_type, severity, since, limit, _ANOMALY_COLUMNS):
+            anomaly = dict(row)
+            if anomaly['pattern_data'] and not raw_json:
+                anomaly['pattern_data'] = orjson.loads(anomaly['pattern_data'])
+            anomalies.append(anomaly)
+        
+        return anomalies
+    
+    def _iter_anomalies(self, anomaly_type: Optional[str] = None,
+                        severity: Optional[str] = None,
+                        since: Optional[datetime] = None,
+                        limit: int = 100, projection: str = "*") -> Iterator[sqlite3.Row]:
+        """Anomaly rows for get_anomalies, newest first, streamed off the cursor."""
+        with self._get_connection(read_only=True) as conn:
+            columns = []
             params = []
             
             if anomaly_type:
-                query += " AND anomaly_type = ?"
+                columns.append("anomaly_type")
                 params.append(anomaly_type)
             
             if severity:
-                query += " AND severity = ?"
+                columns.append("severity")
                 params.append(severity)
             
             if since:
-                query += " AND timestamp >= ?"
                 params.append(since.timestamp())
             
-            query += " ORDER BY timestamp DESC LIMIT ?"
             params.append(limit)
             
-            cursor.execute(query, params)
-            
-            anomalies = []
-            for row in cursor.fetchall():
-                anomaly = dict(row)
-                if anomaly['pattern_data']:
-                    anomaly['pattern_data'] = json.loads(anomaly['pattern_data'])
-                anomalies.append(anomaly)
-            
-            return anomalies
+            yield from conn.execute(_build_query("anomalies", projection, tuple(columns), bool(since)), params)
     
     def get_anomaly_count(self, since: Optional[datetime] = None) -> int:
         """Get total count of anomalies, optionally since a given time."""
-        with self._get_connection() as conn:
+        with self._get_connection(read_only=True) as conn:
             cursor = conn.cursor()
             
             if since:
@@ -338,17 +954,12 @@ class MemoryBank:
         Returns:
             Session database ID
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            timestamp = datetime.now().timestamp()
-            
-            cursor.execute("""
-                INSERT INTO sessions (session_id, start_time, status)
-                VALUES (?, ?, 'ACTIVE')
-            """, (session_id, timestamp))
-            
-            conn.commit()
-            return cursor.lastrowid
+        timestamp = time.time()
+        
+        return self._write(lambda conn: conn.execute("""
+            INSERT INTO sessions (session_id, start_time, status)
+            VALUES (?, ?, 'ACTIVE')
+        """, (session_id, timestamp)).lastrowid)
     
     def end_session(self, session_id: str, 
                     total_energy: Optional[float] = None,
@@ -365,36 +976,27 @@ class MemoryBank:
             max_current: Maximum current (A)
             min_current: Minimum current (A)
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            timestamp = datetime.now().timestamp()
-            
-            cursor.execute("""
-                UPDATE sessions
-                SET end_time = ?, total_energy = ?, avg_current = ?,
-                    max_current = ?, min_current = ?, status = 'COMPLETED'
-                WHERE session_id = ?
-            """, (timestamp, total_energy, avg_current, max_current, 
-                  min_current, session_id))
-            
-            conn.commit()
+        timestamp = time.time()
+        
+        self._write(lambda conn: conn.execute("""
+            UPDATE sessions
+            SET end_time = ?, total_energy = ?, avg_current = ?,
+                max_current = ?, min_current = ?, status = 'COMPLETED'
+            WHERE session_id = ?
+        """, (timestamp, total_energy, avg_current, max_current, 
+              min_current, session_id)))
     
     def increment_session_anomaly_count(self, session_id: str):
         """Increment the anomaly count for a session."""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE sessions
-                SET anomaly_count = anomaly_count + 1
-                WHERE session_id = ?
-            """, (session_id,))
-            
-            conn.commit()
+        self._write(lambda conn: conn.execute("""
+            UPDATE sessions
+            SET anomaly_count = anomaly_count + 1
+            WHERE session_id = ?
+        """, (session_id,)))
     
     def get_session(self, session_id: str) -> Optional[Dict]:
         """Get session details by session ID."""
-        with self._get_connection() as conn:
+        with self._get_connection(read_only=True) as conn:
             cursor = conn.cursor()
             
             cursor.execute(
@@ -407,7 +1009,7 @@ class MemoryBank:
     
     def get_recent_sessions(self, limit: int = 10) -> List[Dict]:
         """Get most recent charging sessions."""
-        with self._get_connection() as conn:
+        with self._get_connection(read_only=True) as conn:
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -431,21 +1033,58 @@ class MemoryBank:
             unit: Unit of measurement (e.g., "A", "V", "W")
             metadata: Additional metadata
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            timestamp = datetime.now().timestamp()
-            metadata_json = json.dumps(metadata) if metadata else None
-            
-            cursor.execute("""
-                INSERT INTO metrics (timestamp, metric_name, metric_value, unit, metadata)
-                VALUES (?, ?, ?, ?, ?)
-            """, (timestamp, metric_name, metric_value, unit, metadata_json))
-            
-            conn.commit()
+        timestamp = time.time()
+        series_id = self._series_id(metric_name, unit, metadata)
+        
+        self._insert(self._insert_sql("metric_samples", timestamp),
+                     (series_id, timestamp, metric_value))
+    
+    def _series_id(self, metric_name: str, unit: str, metadata: Optional[Dict]) -> int:
+        """Id of the (name, unit, metadata) series, created on first use and cached."""
+        key = (metric_name, unit or "", orjson.dumps(metadata).decode() if metadata else "")
+        series_id = self._series_ids.get(key)
+        if series_id is None:
+            # Series another process (or an earlier run) created: plain read, no
+            # round-trip through the writer
+            row = self._thread_connection(read_only=True).execute(
+                "SELECT id FROM metric_series WHERE name = ? AND unit = ? AND metadata = ?", key
+            ).fetchone()
+            if row is not None:
+                self._series_ids[key] = row[0]
+                return row[0]
+            
+            def create(conn):
+                conn.execute(
+                    "INSERT OR IGNORE INTO metric_series (name, unit, metadata) VALUES (?, ?, ?)", key
+                )
+                return conn.execute(
+                    "SELECT id FROM metric_series WHERE name = ? AND unit = ? AND metadata = ?", key
+                ).fetchone()[0]
+            series_id = self._write(create)
+            self._series_ids[key] = series_id
+        return series_id
+    
+    def record_metrics_bulk(self, rows: List[Tuple[float, str, float, str, Optional[Dict]]]) -> int:
+        """
+        Record many metric samples in a single transaction.
+        
+        Args:
+            rows: (timestamp, metric_name, metric_value, unit, metadata) tuples
+        
+        Returns:
+            Number of samples written
+        """
+        grouped: Dict[str, List[tuple]] = {}
+        for ts, name, value, unit, metadata in rows:
+            grouped.setdefault(self._insert_sql("metric_samples", ts), []).append(
+                (self._series_id(name, unit, metadata), ts, value)
+            )
+        return self._insert_many(grouped)
     
     def get_metrics(self, metric_name: str,
                    since: Optional[datetime] = None,
-                   limit: int = 1000) -> List[Dict]:
+                   limit: int = 1000, raw_json: bool = False,
+                   include_metadata: bool = True) -> List[Dict]:
         """
         Query metrics with optional time filter.
         
@@ -453,33 +1092,74 @@ class MemoryBank:
             metric_name: Name of metric to retrieve
             since: Only return metrics after this time
             limit: Maximum number of metrics to return
+            raw_json: Leave 'metadata' as the stored JSON text
+            include_metadata: False leaves 'metadata' out of the result
         
         Returns:
             List of metric dictionaries
         """
-        with self._get_connection() as conn:
+        self.flush()
+        with self._get_connection(read_only=True) as conn:
             cursor = conn.cursor()
             
-            query = "SELECT * FROM metrics WHERE metric_name = ?"
+            metadata_column = ", s.metadata AS metadata" if include_metadata else ""
+            query = f"""
+                SELECT m.id AS id, m.ts AS timestamp, s.name AS metric_name,
+                       m.value AS metric_value, s.unit AS unit{metadata_column}
+                FROM metric_samples m JOIN metric_series s ON s.id = m.series_id
+                WHERE s.name = ?
+            """
             params = [metric_name]
             
             if since:
-                query += " AND timestamp >= ?"
+                query += " AND m.ts >= ?"
                 params.append(since.timestamp())
             
-            query += " ORDER BY timestamp DESC LIMIT ?"
+            query += " ORDER BY m.ts DESC LIMIT ?"
             params.append(limit)
             
             cursor.execute(query, params)
-            
-            metrics = []
-            for row in cursor.fetchall():
-                metric = dict(row)
-                if metric['metadata']:
-                    metric['metadata'] = json.loads(metric['metadata'])
-                metrics.append(metric)
-            
-            return metrics
+            rows = [dict(row) for row in cursor.fetchall()]
+            
+            # Compacted days: series overlap in time, so decode every block ending at or
+            # after the oldest row kept so far, then keep the newest limit rows
+            block_query = """
+                SELECT b.end_ts, b.ts_blob, b.val_blob, s.name, s.unit, s.metadata
+                FROM metric_blocks b JOIN metric_series s ON s.id = b.series_id
+                WHERE s.name = ?
+            """
+            block_params = [metric_name]
+            if since:
+                block_query += " AND b.end_ts >= ?"
+                block_params.append(since.timestamp())
+            block_query += " ORDER BY b.end_ts DESC"
+            
+            floor = since.timestamp() if since else float('-inf')
+            oldest = rows[-1]['timestamp'] if rows and len(rows) >= limit else floor
+            for block in cursor.execute(block_query, block_params):
+                if block['end_ts'] < oldest:
+                    break
+                timestamps, values = _decode_block(block['ts_blob'], block['val_blob'])
+                for ts, value in zip(timestamps, values):
+                    if ts >= oldest:
+                        row = {'id': None, 'timestamp': ts, 'metric_name': block['name'],
+                               'metric_value': value, 'unit': block['unit']}
+                        if include_metadata:
+                            row['metadata'] = block['metadata']
+                        rows.append(row)
+                rows.sort(key=lambda row: row['timestamp'], reverse=True)
+                del rows[limit:]
+                if rows and len(rows) >= limit:
+                    oldest = rows[-1]['timestamp']
+            
+            if include_metadata:
+                for metric in rows:
+                    if not metric['metadata']:
+                        metric['metadata'] = None
+                    elif not raw_json:
+                        metric['metadata'] = orjson.loads(metric['metadata'])
+            
+            return rows
     
     def get_metric_statistics(self, metric_name: str,
                             since: Optional[datetime] = None) -> Dict[str, float]:
@@ -491,35 +1171,146 @@ class MemoryBank:
             since: Calculate statistics from this time
         
         Returns:
-            Dictionary with min, max, avg, stddev, count
+            Dictionary with min, max, avg, count (plus stddev, p50, p95, p99
+            when NumPy is installed)
         """
-        with self._get_connection() as conn:
+        return self._metric_statistics(metric_name, [since.timestamp() if since else None])[0]
+    
+    def get_metric_statistics_multi(self, metric_name: str,
+                                    windows: List[Optional[timedelta]]
+                                    ) -> Dict[Optional[timedelta], Dict[str, float]]:
+        """
+        get_metric_statistics for several trailing windows in one pass.
+        
+        Args:
+            metric_name: Name of metric
+            windows: Window lengths ending now (None = all time)
+        
+        Returns:
+            {window: statistics dictionary as in get_metric_statistics}
+        """
+        now = time.time()
+        sinces = [now - window.total_seconds() if window is not None else None
+                  for window in windows]
+        return dict(zip(windows, self._metric_statistics(metric_name, sinces)))
+    
+    def _metric_statistics(self, metric_name: str,
+                           sinces: List[Optional[float]]) -> List[Dict[str, float]]:
+        """
+        Statistics for each lower time bound in sinces (epoch seconds, None =
+        all time), reading the samples and blocks of the widest one once.
+        """
+        bounds = [since if since is not None else float('-inf') for since in sinces]
+        widest, narrowest = min(bounds), max(bounds)
+        series = "series_id IN (SELECT id FROM metric_series WHERE name = :name)"
+        params = {"name": metric_name, "widest": widest}
+        
+        self.flush()
+        with self._get_connection(read_only=True) as conn:
+            blocks = conn.execute(f"""
+                SELECT start_ts, n, min_value, max_value, sum_value, ts_blob, val_blob
+                FROM metric_blocks WHERE {series} AND end_ts >= :widest
+            """, params)
+            
+            if np is not None:
+                rows = conn.execute(
+                    f"SELECT ts, value FROM metric_samples WHERE {series} AND ts >= :widest", params)
+                samples = np.fromiter(itertools.chain.from_iterable(rows),
+                                      dtype=np.float64).reshape(-1, 2)
+                ts_parts, value_parts = [samples[:, 0]], [samples[:, 1]]
+                for block in blocks:
+                    values = _decode_values_np(block['val_blob'])
+                    if block['start_ts'] < narrowest:
+                        ts_parts.append(_decode_timestamps_np(block['ts_blob']))
+                    else:
+                        # Inside every window: the exact timestamps are not needed
+                        ts_parts.append(np.full(values.size, block['start_ts']))
+                    value_parts.append(values)
+                timestamps = np.concatenate(ts_parts)
+                values = np.concatenate(value_parts)
+                return [_summarize_values(values[timestamps >= bound] if since is not None else values)
+                        for since, bound in zip(sinces, bounds)]
+            
+            # Without NumPy: one conditional aggregate per window over the raw samples...
+            columns = []
+            for i, bound in enumerate(bounds):
+                params[f"b{i}"] = bound
+                for func, expr in (("COUNT", "1"), ("SUM", "value"), ("MIN", "value"), ("MAX", "value")):
+                    columns.append(f"{func}(CASE WHEN ts >= :b{i} THEN {expr} END)")
+            row = conn.execute(f"SELECT {', '.join(columns)} FROM metric_samples "
+                               f"WHERE {series} AND ts >= :widest", params).fetchone()
+            totals = [list(row[4 * i:4 * i + 4]) for i in range(len(bounds))]  # count, sum, min, max
+            
+            # ...plus the block summaries; a block straddling a bound is decoded once
+            for block in blocks:
+                decoded = None
+                for acc, bound in zip(totals, bounds):
+                    if block['start_ts'] >= bound:
+                        n, b_sum, b_min, b_max = (block['n'], block['sum_value'],
+                                                  block['min_value'], block['max_value'])
+                    else:
+                        if decoded is None:
+                            decoded = list(zip(*_decode_block(block['ts_blob'], block['val_blob'])))
+                        values = [v for ts, v in decoded if ts >= bound]
+                        if not values:
+                            continue
+                        n, b_sum, b_min, b_max = len(values), sum(values), min(values), max(values)
+                    acc[0] += n
+                    acc[1] = b_sum if acc[1] is None else acc[1] + b_sum
+                    acc[2] = b_min if acc[2] is None else min(acc[2], b_min)
+                    acc[3] = b_max if acc[3] is None else max(acc[3], b_max)
+            
+            return [{
+                'min': lo or 0,
+                'max': hi or 0,
+                'avg': total / count if count else 0,
+                'count': count
+            } for count, total, lo, hi in totals]
+    
+    def get_metric_array(self, metric_name: str,
+                         since: Optional[datetime] = None) -> "np.ndarray":
+        """
+        All values of a metric as one float64 array (raw samples and
+        compacted blocks, not in time order). Requires NumPy.
+        
+        Args:
+            metric_name: Name of metric
+            since: Only values from this time
+        
+        Returns:
+            1-D float64 array
+        """
+        if np is None:
+            raise ImportError("get_metric_array requires numpy")
+        
+        self.flush()
+        with self._get_connection(read_only=True) as conn:
             cursor = conn.cursor()
             
             query = """
-                SELECT 
-                    MIN(metric_value) as min_value,
-                    MAX(metric_value) as max_value,
-                    AVG(metric_value) as avg_value,
-                    COUNT(*) as count
-                FROM metrics
-                WHERE metric_name = ?
+                SELECT value FROM metric_samples
+                WHERE series_id IN (SELECT id FROM metric_series WHERE name = ?)
             """
             params = [metric_name]
-            
             if since:
-                query += " AND timestamp >= ?"
+                query += " AND ts >= ?"
                 params.append(since.timestamp())
-            
             cursor.execute(query, params)
-            row = cursor.fetchone()
+            parts = [np.fromiter((row[0] for row in cursor), dtype=np.float64, count=-1)]
             
-            return {
-                'min': row['min_value'] or 0,
-                'max': row['max_value'] or 0,
-                'avg': row['avg_value'] or 0,
-                'count': row['count'] or 0
-            }
+            block_query = """
+                SELECT start_ts, ts_blob, val_blob FROM metric_blocks
+                WHERE series_id IN (SELECT id FROM metric_series WHERE name = ?)
+            """
+            if since:
+                block_query += " AND end_ts >= ?"
+            for block in cursor.execute(block_query, params):
+                values = _decode_values_np(block['val_blob'])
+                if since and block['start_ts'] < params[1]:
+                    values = values[_decode_timestamps_np(block['ts_blob']) >= params[1]]
+                parts.append(values)
+            
+            return np.concatenate(parts)
     
     # ==================== PATTERN LEARNING ====================
     
@@ -533,53 +1324,48 @@ class MemoryBank:
             pattern_data: Pattern details (as dictionary)
             confidence: Confidence score (0.0 to 1.0)
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            timestamp = datetime.now().timestamp()
-            pattern_json = json.dumps(pattern_data)
-            
-            # Check if pattern already exists
-            cursor.execute("""
-                SELECT id FROM patterns
-                WHERE pattern_type = ? AND pattern_data = ?
-            """, (pattern_type, pattern_json))
-            
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Update existing pattern
-                cursor.execute("""
-                    UPDATE patterns
-                    SET frequency = frequency + 1,
-                        last_seen = ?,
-                        confidence = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                """, (timestamp, confidence, existing['id']))
-            else:
-                # Insert new pattern
-                cursor.execute("""
-                    INSERT INTO patterns (pattern_type, pattern_data, last_seen, confidence)
-                    VALUES (?, ?, ?, ?)
-                """, (pattern_type, pattern_json, timestamp, confidence))
-            
-            conn.commit()
+        timestamp = time.time()
+        # json.dumps (not orjson): existing rows were hashed from this encoding
+        pattern_json = json.dumps(pattern_data)
+        
+        # Insert new pattern, or bump the existing one in the same statement
+        self._write(lambda conn: conn.execute("""
+            INSERT INTO patterns (pattern_type, pattern_hash, pattern_data, last_seen, confidence)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(pattern_type, pattern_hash) DO UPDATE
+            SET frequency = frequency + 1,
+                last_seen = excluded.last_seen,
+                confidence = excluded.confidence,
+                updated_at = CURRENT_TIMESTAMP
+        """, (pattern_type, _pattern_hash(pattern_json), pattern_json, timestamp, confidence)))
     
     def get_patterns(self, pattern_type: Optional[str] = None,
-                    min_frequency: int = 1) -> List[Dict]:
+                    min_frequency: int = 1, raw_json: bool = False) -> List[Dict]:
         """
         Query learned patterns.
         
         Args:
             pattern_type: Filter by pattern type
             min_frequency: Minimum occurrence frequency
+            raw_json: Leave 'pattern_data' as the stored JSON text
         
         Returns:
             List of pattern dictionaries
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
+        patterns = []
+        for row in self._iter_patterns(pattern_type, min_frequency):
+            pattern = dict(row)
+            del pattern['pattern_hash']  # internal key, not JSON-serializable
+            if not raw_json:
+                pattern['pattern_data'] = orjson.loads(pattern['pattern_data'])
+            patterns.append(pattern)
+        
+        return patterns
+    
+    def _iter_patterns(self, pattern_type: Optional[str] = None,
+                       min_frequency: int = 1) -> Iterator[sqlite3.Row]:
+        """Pattern rows for get_patterns, streamed off the cursor."""
+        with self._get_connection(read_only=True) as conn:
             query = "SELECT * FROM patterns WHERE frequency >= ?"
             params = [min_frequency]
             
@@ -589,15 +1375,7 @@ class MemoryBank:
             
             query += " ORDER BY frequency DESC, last_seen DESC"
             
-            cursor.execute(query, params)
-            
-            patterns = []
-            for row in cursor.fetchall():
-                pattern = dict(row)
-                pattern['pattern_data'] = json.loads(pattern['pattern_data'])
-                patterns.append(pattern)
-            
-            return patterns
+            yield from conn.execute(query, params)
     
     # ==================== ANALYTICS ====================
     
@@ -608,35 +1386,36 @@ class MemoryBank:
         Returns:
             Dictionary with system statistics
         """
-        now = datetime.now()
-        last_hour = now - timedelta(hours=1)
-        last_day = now - timedelta(days=1)
+        now = time.time()
         
-        with self._get_connection() as conn:
+        self.flush()
+        with self._get_connection(read_only=True) as conn:
             cursor = conn.cursor()
             
-            # Total counts
-            cursor.execute("SELECT COUNT(*) FROM events")
-            total_events = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM anomalies")
-            total_anomalies = cursor.fetchone()[0]
+            # One read transaction: both statements see the same snapshot and the
+            # shared lock is taken once
+            cursor.execute("BEGIN")
             
-            cursor.execute("SELECT COUNT(*) FROM sessions")
-            total_sessions = cursor.fetchone()[0]
-            
-            # Recent counts
-            cursor.execute(
-                "SELECT COUNT(*) FROM events WHERE timestamp >= ?",
-                (last_hour.timestamp(),)
-            )
-            events_last_hour = cursor.fetchone()[0]
-            
-            cursor.execute(
-                "SELECT COUNT(*) FROM anomalies WHERE timestamp >= ?",
-                (last_hour.timestamp(),)
-            )
-            anomalies_last_hour = cursor.fetchone()[0]
+            # All counters in one statement (one dispatch instead of six). The last
+            # hour is the stats_bucket minutes after since's minute plus the rows of
+            # that partial minute itself
+            since = now - 3600
+            since_minute = int(since // 60)
+            cursor.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM events) AS total_events,
+                    (SELECT COUNT(*) FROM anomalies) AS total_anomalies,
+                    (SELECT COUNT(*) FROM sessions) AS total_sessions,
+                    (SELECT COALESCE(SUM(events), 0) FROM stats_bucket WHERE minute > :since_minute)
+                      + (SELECT COUNT(*) FROM events WHERE timestamp >= :since AND timestamp < :minute_end)
+                      AS events_last_hour,
+                    (SELECT COALESCE(SUM(anomalies), 0) FROM stats_bucket WHERE minute > :since_minute)
+                      + (SELECT COUNT(*) FROM anomalies WHERE timestamp >= :since AND timestamp < :minute_end)
+                      AS anomalies_last_hour,
+                    (SELECT COUNT(*) FROM sessions WHERE status = 'ACTIVE') AS active_sessions
+            """, {"since": since, "since_minute": since_minute,
+                  "minute_end": (since_minute + 1) * 60})
+            counts = cursor.fetchone()
             
             # Anomaly breakdown by severity
             cursor.execute("""
@@ -646,20 +1425,17 @@ class MemoryBank:
             """)
             anomalies_by_severity = {row['severity']: row['count'] 
                                     for row in cursor.fetchall()}
-            
-            # Active sessions
-            cursor.execute("SELECT COUNT(*) FROM sessions WHERE status = 'ACTIVE'")
-            active_sessions = cursor.fetchone()[0]
+            conn.commit()
             
             return {
-                'total_events': total_events,
-                'total_anomalies': total_anomalies,
-                'total_sessions': total_sessions,
-                'events_last_hour': events_last_hour,
-                'anomalies_last_hour': anomalies_last_hour,
+                'total_events': counts['total_events'],
+                'total_anomalies': counts['total_anomalies'],
+                'total_sessions': counts['total_sessions'],
+                'events_last_hour': counts['events_last_hour'],
+                'anomalies_last_hour': counts['anomalies_last_hour'],
                 'anomalies_by_severity': anomalies_by_severity,
-                'active_sessions': active_sessions,
-                'timestamp': now.isoformat()
+                'active_sessions': counts['active_sessions'],
+                'timestamp': datetime.fromtimestamp(now).isoformat()
             }
     
     # ==================== UTILITY METHODS ====================
@@ -671,38 +1447,155 @@ class MemoryBank:
         Args:
             days: Keep data from last N days
         """
-        with self._get_connection() as conn:
+        self.flush()
+        cutoff_dt = datetime.now() - timedelta(days=days)
+        
+        def delete_old(conn):
             cursor = conn.cursor()
-            cutoff = (datetime.now() - timedelta(days=days)).timestamp()
+            cutoff = cutoff_dt.timestamp()
             
-            cursor.execute("DELETE FROM events WHERE timestamp < ?", (cutoff,))
             cursor.execute("DELETE FROM anomalies WHERE timestamp < ?", (cutoff,))
-            cursor.execute("DELETE FROM metrics WHERE timestamp < ?", (cutoff,))
-            
+            cursor.execute("DELETE FROM stats_bucket WHERE minute < ?", (int(cutoff // 60),))
             conn.commit()
+            
+            # Partitioned tables: drop whole days before the cutoff day, trim the cutoff day
+            for base, spec in _PARTITIONED_TABLES.items():
+                cutoff_table = f"{base}_{cutoff_dt:%Y%m%d}"
+                tables = self._load_partitions(conn, base)
+                old = [table for table in tables if table < cutoff_table]
+                if cutoff_table in tables:
+                    cursor.execute(f"DELETE FROM {cutoff_table} WHERE {spec['ts_column']} < ?", (cutoff,))
+                if old:
+                    self._begin_write(conn)
+                    for table in old:
+                        cursor.execute(f"DROP TABLE {table}")
+                    self._rebuild_view(conn, base)
+                conn.commit()
+            
+            # Compacted metric blocks entirely before the cutoff
+            cursor.execute("DELETE FROM metric_blocks WHERE end_ts < ?", (cutoff,))
+        
+        self._write(delete_old)
+        
+        # Kept past days: raw samples -> compressed blocks
+        self.compact_metrics()
+        self._write(self._analyze)
     
-    def export_to_json(self, output_path: str, since: Optional[datetime] = None):
+    def compact_metrics(self) -> int:
+        """
+        Pack metric samples of days before today into compressed per-series
+        blocks (metric_blocks) and drop those day tables. get_metrics and
+        get_metric_statistics read both, so results do not change (block
+        timestamps keep microsecond precision).
+        
+        Returns:
+            Number of samples compacted
+        """
+        self.flush()
+        today = f"metric_samples_{datetime.now():%Y%m%d}"
+        
+        def compact(conn):
+            compacted = 0
+            for table in self._load_partitions(conn, "metric_samples"):
+                if table >= today:
+                    break
+                
+                # Write lock before reading, so no late sample lands between the read and the DROP
+                self._begin_write(conn)
+                
+                # Streamed in (series_id, ts) order off the covering index; one block in memory at a time
+                blocks = []
+                series_id, ts_chunk, value_chunk = None, [], []
+                rows = conn.execute(f"SELECT series_id, ts, value FROM {table} ORDER BY series_id, ts")
+                for row in itertools.chain(rows, [(None, None, None)]):
+                    if ts_chunk and (row[0] != series_id or len(ts_chunk) == METRIC_BLOCK_SIZE):
+                        ts_blob, val_blob = _encode_block(ts_chunk, value_chunk)
+                        blocks.append((series_id, ts_chunk[0], ts_chunk[-1], len(ts_chunk),
+                                       min(value_chunk), max(value_chunk), sum(value_chunk),
+                                       ts_blob, val_blob))
+                        compacted += len(ts_chunk)
+                        ts_chunk, value_chunk = [], []
+                    series_id = row[0]
+                    ts_chunk.append(row[1])
+                    value_chunk.append(row[2])
+                
+                conn.executemany("""
+                    INSERT INTO metric_blocks (series_id, start_ts, end_ts, n, min_value,
+                                               max_value, sum_value, ts_blob, val_blob)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, blocks)
+                conn.execute(f"DROP TABLE {table}")
+                self._rebuild_view(conn, "metric_samples")
+                conn.commit()
+            return compacted
+        
+        with self._partition_lock:
+            compacted = self._write(compact)
+            # A late sample for a compacted day recreates its table on the next insert
+            self._day_cache.pop("metric_samples", None)
+        
+        return compacted
+    
+    def export_to_json(self, output_path, since: Optional[datetime] = None):
         """
         Export all data to JSON file.
         
+        Rows are streamed to the file one at a time (memory stays flat), and
+        the stored data / pattern_data JSON text is copied as-is instead of
+        being parsed and serialized again.
+        
         Args:
-            output_path: Path to output JSON file
+            output_path: Path to output JSON file, or a binary file-like object
+                (anything with write(bytes)); it is written to but not closed
             since: Only export data after this time
         """
-        data = {
-            'events': self.get_events(since=since, limit=10000),
-            'anomalies': self.get_anomalies(since=since, limit=10000),
-            'sessions': self.get_recent_sessions(limit=1000),
-            'patterns': self.get_patterns(),
-            'summary': self.get_dashboard_summary()
-        }
+        with self._get_connection(read_only=True) as conn:
+            sessions = conn.execute("SELECT * FROM sessions ORDER BY start_time DESC LIMIT ?", (1000,))
+        
+        # (key, rows, column holding stored JSON text)
+        sections = (
+            ('events', self._iter_events(since=since, limit=10000), 'data'),
+            ('anomalies', self._iter_anomalies(since=since, limit=10000), 'pattern_data'),
+            ('sessions', sessions, None),
+            ('patterns', self._iter_patterns(), 'pattern_data'),
+        )
         
-        with open(output_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        # A caller's stream is used as-is (left open); a path is opened here
+        target = (contextlib.nullcontext(output_path) if hasattr(output_path, 'write')
+                  else open(output_path, 'wb'))
+        with target as f:
+            f.write(b'{')
+            for key, rows, json_column in sections:
+                f.write(b'\n  "' + key.encode() + b'": [')
+                separator = b'\n    '
+                for row in rows:
+                    record = dict(row)
+                    record.pop('pattern_hash', None)
+                    raw = record.pop(json_column) if json_column else None
+                    body = orjson.dumps(record)
+                    if json_column:
+                        # Splice the stored JSON in as the last member (bytes, str in older rows)
+                        if not raw:
+                            raw = b'null'
+                        elif isinstance(raw, str):
+                            raw = raw.encode()
+                        body = body[:-1] + b',"' + json_column.encode() + b'":' + raw + b'}'
+                    f.write(separator)
+                    f.write(body)
+                    separator = b',\n    '
+                f.write(b'\n  ],')
+            f.write(b'\n  "summary": ' + orjson.dumps(self.get_dashboard_summary()) + b'\n}\n')
     
     def close(self):
-        """Close database connection (called automatically on context exit)."""
-        pass
+        """Write any queued rows and close every thread's connection."""
+        self.flush()
+        if self._write_q is not None:
+            atexit.unregister(self.flush)
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+            self._tls = threading.local()
+        for conn in conns:
+            conn.close()
 
 
 # ==================== TESTING ====================
@@ -22,6 +22,13 @@ from datetime import datetime, timedelta
 from memory_bank import MemoryBank
 from tabulate import tabulate
 
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _fmt(value, suffix=''):
+    """One-decimal value with suffix, 'N/A' when missing (or zero)"""
+    return f"{value:.1f}{suffix}" if value else 'N/A'
+
 
 class MemoryViewer:
     """Interactive viewer for MemoryBank database"""
@@ -66,22 +73,17 @@ class MemoryViewer:
         """Display recent system events"""
         self.print_header(f"📝 Recent Events (Last {limit})")
         
-        events = self.memory.get_events(limit=limit)
+        events = self.memory.get_events(limit=limit, include_data=False)
         
         if not events:
             print("\n  No events found.")
             return
         
-        table_data = []
-        for event in events:
-            timestamp = datetime.fromtimestamp(event['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
-            table_data.append([
-                event['id'],
-                timestamp,
-                event['event_type'],
-                event['component'],
-                event['message'][:50] if event['message'] else ''
-            ])
+        # Rows are produced lazily while tabulate consumes them
+        _from, _ts = datetime.fromtimestamp, TIMESTAMP_FORMAT
+        table_data = ((e['id'], _from(e['timestamp']).strftime(_ts), e['event_type'],
+                       e['component'], (e['message'] or '')[:50])
+                      for e in events)
         
         print()
         print(tabulate(
@@ -101,18 +103,11 @@ class MemoryViewer:
             print("\n  No anomalies found.")
             return
         
-        table_data = []
-        for anomaly in anomalies:
-            timestamp = datetime.fromtimestamp(anomaly['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
-            table_data.append([
-                anomaly['id'],
-                timestamp,
-                anomaly['anomaly_type'],
-                anomaly['severity'],
-                f"{anomaly['current_value']:.1f}" if anomaly['current_value'] else 'N/A',
-                f"{anomaly['expected_value']:.1f}" if anomaly['expected_value'] else 'N/A',
-                f"{anomaly['deviation']:.1f}" if anomaly['deviation'] else 'N/A'
-            ])
+        _from, _ts = datetime.fromtimestamp, TIMESTAMP_FORMAT
+        table_data = [(a['id'], _from(a['timestamp']).strftime(_ts), a['anomaly_type'],
+                       a['severity'], _fmt(a['current_value']), _fmt(a['expected_value']),
+                       _fmt(a['deviation']))
+                      for a in anomalies]
         
         print()
         print(tabulate(
@@ -132,27 +127,14 @@ class MemoryViewer:
             print("\n  No sessions found.")
             return
         
-        table_data = []
-        for session in sessions:
-            start_time = datetime.fromtimestamp(session['start_time']).strftime('%Y-%m-%d %H:%M:%S')
-            
-            if session['end_time']:
-                end_time = datetime.fromtimestamp(session['end_time']).strftime('%H:%M:%S')
-                duration = session['end_time'] - session['start_time']
-                duration_str = f"{int(duration)}s"
-            else:
-                end_time = "ACTIVE"
-                duration_str = "N/A"
-            
-            table_data.append([
-                session['session_id'],
-                start_time,
-                end_time,
-                duration_str,
-                f"{session['avg_current']:.1f}A" if session['avg_current'] else 'N/A',
-                f"{session['max_current']:.1f}A" if session['max_current'] else 'N/A',
-                session['anomaly_count']
-            ])
+        # Active sessions (no end_time) show ACTIVE and no duration
+        _from, _ts = datetime.fromtimestamp, TIMESTAMP_FORMAT
+        table_data = [(s['session_id'], _from(s['start_time']).strftime(_ts),
+                       _from(s['end_time']).strftime('%H:%M:%S') if s['end_time'] else "ACTIVE",
+                       f"{int(s['end_time'] - s['start_time'])}s" if s['end_time'] else "N/A",
+                       _fmt(s['avg_current'], 'A'), _fmt(s['max_current'], 'A'),
+                       s['anomaly_count'])
+                      for s in sessions]
         
         print()
         print(tabulate(
@@ -172,19 +154,10 @@ class MemoryViewer:
             print("\n  No patterns learned yet.")
             return
         
-        table_data = []
-        for pattern in patterns:
-            last_seen = datetime.fromtimestamp(pattern['last_seen']).strftime('%Y-%m-%d %H:%M:%S')
-            pattern_summary = str(pattern['pattern_data'])[:50]
-            
-            table_data.append([
-                pattern['id'],
-                pattern['pattern_type'],
-                pattern_summary,
-                pattern['frequency'],
-                f"{pattern['confidence']:.2f}",
-                last_seen
-            ])
+        _from, _ts = datetime.fromtimestamp, TIMESTAMP_FORMAT
+        table_data = [(p['id'], p['pattern_type'], str(p['pattern_data'])[:50],
+                       p['frequency'], f"{p['confidence']:.2f}", _from(p['last_seen']).strftime(_ts))
+                      for p in patterns]
         
         print()
         print(tabulate(
@@ -198,12 +171,10 @@ class MemoryViewer:
         """Display current metric statistics"""
         self.print_header("📊 Current Statistics")
         
-        # Last hour statistics
-        stats_1h = self.memory.get_metric_statistics("current", since=datetime.now() - timedelta(hours=1))
-        # Last 10 minutes statistics
-        stats_10m = self.memory.get_metric_statistics("current", since=datetime.now() - timedelta(minutes=10))
-        # All-time statistics
-        stats_all = self.memory.get_metric_statistics("current")
+        # Last hour, last 10 minutes and all-time statistics in one pass
+        hour, ten_minutes = timedelta(hours=1), timedelta(minutes=10)
+        stats = self.memory.get_metric_statistics_multi("current", [hour, ten_minutes, None])
+        stats_1h, stats_10m, stats_all = stats[hour], stats[ten_minutes], stats[None]
         
         print()
         print("⏱️  Last Hour:")
@@ -211,6 +182,7 @@ class MemoryViewer:
         print(f"   Min:          {stats_1h['min']:.2f} A")
         print(f"   Max:          {stats_1h['max']:.2f} A")
         print(f"   Average:      {stats_1h['avg']:.2f} A")
+        self._print_spread(stats_1h)
         
         print()
         print("⏱️  Last 10 Minutes:")
@@ -218,6 +190,7 @@ class MemoryViewer:
         print(f"   Min:          {stats_10m['min']:.2f} A")
         print(f"   Max:          {stats_10m['max']:.2f} A")
         print(f"   Average:      {stats_10m['avg']:.2f} A")
+        self._print_spread(stats_10m)
         
         print()
         print("📈 All-Time:")
@@ -225,8 +198,16 @@ class MemoryViewer:
         print(f"   Min:          {stats_all['min']:.2f} A")
         print(f"   Max:          {stats_all['max']:.2f} A")
         print(f"   Average:      {stats_all['avg']:.2f} A")
+        self._print_spread(stats_all)
         print()
     
+    @staticmethod
+    def _print_spread(stats):
+        """Std dev / percentiles (only present when NumPy is installed)"""
+        if 'stddev' in stats:
+            print(f"   Std Dev:      {stats['stddev']:.2f} A")
+            print(f"   P50/P95/P99:  {stats['p50']:.2f} / {stats['p95']:.2f} / {stats['p99']:.2f} A")
+    
     def export_data(self, output_file: str = "memory_export.json"):
         """Export all data to JSON"""
         self.print_header("💾 Exporting Data")
@@ -260,7 +241,8 @@ class MemoryViewer:
         events = self.memory.get_events(
             component=component,
             event_type=event_type,
-            limit=50
+            limit=50,
+            include_data=False
         )
         
         if not events:
@@ -269,15 +251,10 @@ class MemoryViewer:
         
         print(f"\n📊 Found {len(events)} events")
         
-        table_data = []
-        for event in events[:20]:  # Show first 20
-            timestamp = datetime.fromtimestamp(event['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
-            table_data.append([
-                timestamp,
-                event['event_type'],
-                event['component'],
-                event['message'][:60] if event['message'] else ''
-            ])
+        _from, _ts = datetime.fromtimestamp, TIMESTAMP_FORMAT
+        table_data = [(_from(e['timestamp']).strftime(_ts), e['event_type'], e['component'],
+                       (e['message'] or '')[:60])
+                      for e in events[:20]]  # Show first 20
         
         print()
         print(tabulate(
@@ -8,14 +8,18 @@ Visualizes the anomaly pattern with live updating graph.
 """
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
+import numpy as np
+from matplotlib.collections import LineCollection
 from collections import deque
 import time
-import json
+import orjson
 from datetime import datetime, timedelta
 from memory_bank import MemoryBank
+from shared_current import open_reader, read_current
 
-# Shared data file
+# Shared data file (fallback when cp.py's shared-memory segment is not there)
 DATA_FILE = "/tmp/ev_current.json"
+reader = None
 
 # Initialize MemoryBank
 memory = MemoryBank("ev_charging_memory.db")
@@ -28,73 +32,81 @@ currents = deque(maxlen=max_points)
 # Start time for relative timestamps
 start_time = time.time()
 
-def read_can_data():
-    """Read current value from shared file"""
+def read_can_data(now):
+    """Read current value from shared memory or the shared file (now: this frame's time.time())"""
+    global reader
     try:
-        with open(DATA_FILE, 'r') as f:
-            data = json.load(f)
-            current = data.get("current", 0)
-            timestamp = data.get("timestamp", 0)
-            
-            if timestamp > 0:
-                elapsed = time.time() - start_time
-                print(f"📊 PLOT: Current = {current}A at {elapsed:.1f}s")
-                return elapsed, current
-    except (FileNotFoundError, json.JSONDecodeError):
+        # Attach once cp.py is publishing; until then each frame reads the JSON file
+        if reader is None:
+            reader = open_reader()
+        timestamp, current = read_current(reader, DATA_FILE)
+        
+        if timestamp > 0:
+            elapsed = now - start_time
+            print(f"📊 PLOT: Current = {current}A at {elapsed:.1f}s")
+            return elapsed, current
+    except (FileNotFoundError, orjson.JSONDecodeError):
         pass
     return None, None
 
 def animate(frame):
-    """Animation function called periodically"""
+    """
+    Animation function called periodically.
+    
+    Blitting: the axes, labels and grid are drawn once; each frame only updates
+    and returns the artists created in main() (a full redraw happens only when
+    the axis limits move).
+    """
+    global fill
+    
+    # One clock read per frame, shared by the reader and both MemoryBank queries
+    now = time.time()
+    now_dt = datetime.fromtimestamp(now)
+    
     # Read new data from CAN
-    timestamp, current = read_can_data()
+    timestamp, current = read_can_data(now)
     
     if timestamp is not None and current is not None:
         timestamps.append(timestamp)
         currents.append(current)
         
-        # Clear and redraw
-        ax.clear()
-        
         # Plot the data
-        if len(timestamps) > 0:
-            ax.plot(list(timestamps), list(currents), 'b-', linewidth=2, label='Charging Current')
-            ax.fill_between(list(timestamps), list(currents), alpha=0.3)
+        line.set_data(timestamps, currents)
+        fill.remove()
+        fill = ax.fill_between(timestamps, currents, alpha=0.3, color='tab:blue', animated=True)
         
         # Get and mark historical anomalies from MemoryBank
         try:
             recent_anomalies = memory.get_anomalies(
                 anomaly_type="CURRENT_LIMIT_FLUCTUATION",
-                since=datetime.now() - timedelta(minutes=2),
+                since=now_dt - timedelta(minutes=2),
                 limit=20
             )
+            anomaly_times = np.empty(0)
             if recent_anomalies:
-                anomaly_times = []
-                for anomaly in recent_anomalies:
-                    anom_time = anomaly['timestamp'] - (time.time() - start_time) + timestamp
-                    if min(timestamps) <= anom_time <= max(timestamps):
-                        anomaly_times.append(anom_time)
-                
-                if anomaly_times:
-                    for at in anomaly_times:
-                        ax.axvline(x=at, color='red', linestyle='--', alpha=0.3, linewidth=1)
+                # Shift to plot time (timestamp is now - start_time) and keep the
+                # visible window in one vectorized pass (timestamps is increasing,
+                # so its ends are the window bounds)
+                anomaly_times = np.fromiter((a['timestamp'] for a in recent_anomalies),
+                                            dtype=np.float64, count=len(recent_anomalies))
+                anomaly_times -= start_time
+                anomaly_times = anomaly_times[(anomaly_times >= timestamps[0]) &
+                                              (anomaly_times <= timestamps[-1])]
+            
+            # One LineCollection for all markers, full axis height like axvline
+            markers.set_segments([((at, 0), (at, 1)) for at in anomaly_times])
         except Exception as e:
             pass
         
-        # Styling
-        ax.set_xlabel('Time (seconds)', fontsize=12, fontweight='bold')
-        ax.set_ylabel('Current (A)', fontsize=12, fontweight='bold')
-        ax.set_title('⚡ EV Charging Current - Live Monitoring\nRepeated Fluctuation Anomaly', 
-                     fontsize=14, fontweight='bold', pad=20)
-        ax.grid(True, alpha=0.3, linestyle='--')
-        ax.legend(loc='upper right')
-        
-        # Set y-axis limits with some padding
-        if len(currents) > 0:
-            max_current = max(currents)
-            ax.set_ylim(-5, max(110, max_current + 10))
-        else:
-            ax.set_ylim(-5, 110)
+        # Axis limits change rarely: x jumps ahead by half a window, y only grows
+        # past 110 A. Only then is the whole figure (ticks included) redrawn
+        xmin, xmax = ax.get_xlim()
+        ymax = max(110, max(currents) + 10)
+        if timestamp > xmax or ax.get_ylim()[1] != ymax:
+            span = max(timestamps[-1] - timestamps[0], 1.0)
+            ax.set_xlim(timestamps[0], timestamps[-1] + span / 2)
+            ax.set_ylim(-5, ymax)
+            fig.canvas.draw()
         
         # Add anomaly indicator if current is fluctuating
         anomaly_detected = False
@@ -102,40 +114,24 @@ def animate(frame):
             recent_currents = list(currents)[-10:]
             if max(recent_currents) - min(recent_currents) > 20:
                 anomaly_detected = True
-                ax.text(0.02, 0.98, '⚠️ ANOMALY DETECTED', 
-                       transform=ax.transAxes,
-                       bbox=dict(boxstyle='round', facecolor='red', alpha=0.7),
-                       verticalalignment='top',
-                       fontsize=10,
-                       fontweight='bold',
-                       color='white')
+        anomaly_txt.set_visible(anomaly_detected)
         
         # Add current value display
-        if len(currents) > 0:
-            current_val = currents[-1]
-            ax.text(0.98, 0.98, f'Current: {current_val:.1f} A', 
-                   transform=ax.transAxes,
-                   bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.8),
-                   verticalalignment='top',
-                   horizontalalignment='right',
-                   fontsize=11,
-                   fontweight='bold')
+        current_txt.set_text(f'Current: {currents[-1]:.1f} A')
         
         # Add MemoryBank statistics
         try:
-            stats = memory.get_metric_statistics("current", since=datetime.now() - timedelta(minutes=1))
+            stats = memory.get_metric_statistics("current", since=now_dt - timedelta(minutes=1))
             if stats['count'] > 0:
-                stats_text = f"Min: {stats['min']:.1f}A | Max: {stats['max']:.1f}A | Avg: {stats['avg']:.1f}A"
-                ax.text(0.02, 0.02, stats_text, 
-                       transform=ax.transAxes,
-                       bbox=dict(boxstyle='round', facecolor='lightyellow', alpha=0.8),
-                       verticalalignment='bottom',
-                       fontsize=9)
+                stats_txt.set_text(f"Min: {stats['min']:.1f}A | Max: {stats['max']:.1f}A | Avg: {stats['avg']:.1f}A")
+                stats_txt.set_visible(True)
         except Exception:
             pass
+    
+    return fill, line, markers, anomaly_txt, current_txt, stats_txt
 
 def main():
-    global ax, fig, start_time
+    global ax, fig, start_time, line, fill, markers, anomaly_txt, current_txt, stats_txt
     
     print("=" * 60)
     print("📈 Real-time Current Plotter Starting...")
@@ -162,8 +158,45 @@ def main():
     fig, ax = plt.subplots(figsize=(12, 6))
     fig.canvas.manager.set_window_title('EV Charging Anomaly Simulator - MemoryBank Enabled')
     
+    # Static parts, drawn once (animate only touches the artists below)
+    ax.set_xlabel('Time (seconds)', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Current (A)', fontsize=12, fontweight='bold')
+    ax.set_title('⚡ EV Charging Current - Live Monitoring\nRepeated Fluctuation Anomaly', 
+                 fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.set_xlim(0, 10)
+    ax.set_ylim(-5, 110)
+    
+    line, = ax.plot([], [], 'b-', linewidth=2, label='Charging Current')
+    fill = ax.fill_between([], [], alpha=0.3)
+    markers = ax.add_collection(LineCollection([], colors='red', linestyles='--', alpha=0.3,
+                                               linewidth=1, transform=ax.get_xaxis_transform()))
+    ax.legend(loc='upper right')
+    
+    anomaly_txt = ax.text(0.02, 0.98, '⚠️ ANOMALY DETECTED', 
+                          transform=ax.transAxes,
+                          bbox=dict(boxstyle='round', facecolor='red', alpha=0.7),
+                          verticalalignment='top',
+                          fontsize=10,
+                          fontweight='bold',
+                          color='white',
+                          visible=False)
+    current_txt = ax.text(0.98, 0.98, '', 
+                          transform=ax.transAxes,
+                          bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.8),
+                          verticalalignment='top',
+                          horizontalalignment='right',
+                          fontsize=11,
+                          fontweight='bold')
+    stats_txt = ax.text(0.02, 0.02, '', 
+                        transform=ax.transAxes,
+                        bbox=dict(boxstyle='round', facecolor='lightyellow', alpha=0.8),
+                        verticalalignment='bottom',
+                        fontsize=9,
+                        visible=False)
+    
     # Create animation (update every 100ms for smooth visualization)
-    ani = animation.FuncAnimation(fig, animate, interval=100, cache_frame_data=False)
+    ani = animation.FuncAnimation(fig, animate, interval=100, blit=True, cache_frame_data=False)
     
     # Show the plot
     try:
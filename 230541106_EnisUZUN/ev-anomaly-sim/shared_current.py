@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Shared-Memory Current Channel
+Latest (timestamp, current) sample published by cp.py and read by
+data_collector.py / live_detector.py without a JSON file round-trip.
+
+Layout (32 bytes): <Q seq | <d timestamp | <I current
+seq is a seqlock: odd while the writer is updating, even when stable.
+Readers retry until they see the same even seq before and after reading.
+
+Push channel: every sample is also sent as one <dI datagram to each reader
+socket in SOCK_DIR, so readers block on recv() instead of polling.
+"""
+import orjson
+import os
+import socket
+import struct
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+SHM_NAME = "ev_current"
+SHM_SIZE = 32
+SOCK_DIR = "/tmp/ev_current.d"
+
+_SEQ = struct.Struct("<Q")
+_SAMPLE = struct.Struct("<dI")
+_SAMPLE_OFFSET = 8
+
+
+class CurrentWriter:
+    """Single writer side (cp.py)"""
+
+    def __init__(self, name=SHM_NAME):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SHM_SIZE)
+        except FileExistsError:
+            # Left over from a previous run: reuse it
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.buf = self.shm.buf
+        self.seq = _SEQ.unpack_from(self.buf, 0)[0]
+        if self.seq & 1:
+            # Previous writer died mid-update
+            self.seq += 1
+            _SEQ.pack_into(self.buf, 0, self.seq)
+
+    def publish(self, timestamp, current):
+        self.seq += 1
+        _SEQ.pack_into(self.buf, 0, self.seq)  # odd: update in progress
+        _SAMPLE.pack_into(self.buf, _SAMPLE_OFFSET, timestamp, current)
+        self.seq += 1
+        _SEQ.pack_into(self.buf, 0, self.seq)  # even: sample is stable
+
+    def close(self, unlink=True):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class CurrentReader:
+    """Reader side; raises FileNotFoundError if no writer has created the segment"""
+
+    def __init__(self, name=SHM_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Attaching registers the segment with this process' resource tracker,
+        # which would unlink it when the reader exits; the writer owns it
+        try:
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except Exception:
+            pass
+        self.buf = self.shm.buf
+
+    def read(self, retries=100):
+        """Return (seq, timestamp, current), or None if no stable snapshot was seen"""
+        buf = self.buf
+        for _ in range(retries):
+            seq1, = _SEQ.unpack_from(buf, 0)
+            if seq1 & 1:
+                continue
+            timestamp, current = _SAMPLE.unpack_from(buf, _SAMPLE_OFFSET)
+            seq2, = _SEQ.unpack_from(buf, 0)
+            if seq1 == seq2:
+                return seq1, timestamp, current
+        return None
+
+
+class CurrentPublisher:
+    """Writer side of the push channel: one sendto per subscribed reader"""
+
+    RESCAN_SEC = 1.0  # how often SOCK_DIR is listed for new readers
+
+    def __init__(self, sock_dir=SOCK_DIR):
+        os.makedirs(sock_dir, exist_ok=True)
+        self.sock_dir = sock_dir
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.targets = []
+        self._next_scan = 0.0
+
+    def publish(self, timestamp, current):
+        now = time.monotonic()
+        if now >= self._next_scan:
+            self.targets = [os.path.join(self.sock_dir, name)
+                            for name in os.listdir(self.sock_dir) if name.endswith(".sock")]
+            self._next_scan = now + self.RESCAN_SEC
+        if not self.targets:
+            return
+        record = _SAMPLE.pack(timestamp, current)
+        for path in list(self.targets):
+            try:
+                self.sock.sendto(record, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Reader exited without removing its socket
+                self.targets.remove(path)
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                pass  # reader is behind and its queue is full: drop this sample for it
+
+    def close(self):
+        self.sock.close()
+
+
+class CurrentSubscriber:
+    """Reader side of the push channel, bound to SOCK_DIR/<pid>.sock"""
+
+    def __init__(self, timeout=0.1, sock_dir=SOCK_DIR):
+        os.makedirs(sock_dir, exist_ok=True)
+        self.path = os.path.join(sock_dir, f"{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.settimeout(timeout)
+
+    def recv(self):
+        """Next pushed (timestamp, current), or None if nothing arrived within the timeout"""
+        try:
+            data = self.sock.recv(_SAMPLE.size)
+        except socket.timeout:
+            return None
+        return _SAMPLE.unpack(data)
+
+    def close(self):
+        self.sock.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def open_reader(name=SHM_NAME):
+    """Attach to the shared segment, or None when cp.py is not publishing"""
+    try:
+        return CurrentReader(name)
+    except FileNotFoundError:
+        return None
+
+
+def read_current(reader, json_path):
+    """
+    (timestamp, current) from shared memory when attached and published,
+    otherwise from the legacy JSON file (may raise FileNotFoundError / orjson.JSONDecodeError)
+    """
+    if reader is not None:
+        sample = reader.read()
+        if sample is not None and sample[0]:
+            return sample[1], sample[2]
+    with open(json_path, 'rb') as f:
+        data = orjson.loads(f.read())
+    return data.get('timestamp', time.time()), data.get('current', 0)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+MemoryBank regression tests (batched writes, day partitions, concurrent startup)
+Run: python3 test_memory_bank.py  (or python3 -m pytest test_memory_bank.py)
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from memory_bank import MemoryBank, WRITE_FLUSH_SEC
+
+
+def _construct_and_log(db_path, results):
+    """Child process: open the database and write one event"""
+    try:
+        memory = MemoryBank(db_path)
+        memory.log_event("STARTUP", "TEST", f"pid {os.getpid()}")
+        memory.close()
+        results.put("ok")
+    except Exception as e:
+        results.put(repr(e))
+
+
+class MemoryBankTestCase(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._dir.name, "memory.db")
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+
+class TestBatchedWrites(MemoryBankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.memory = MemoryBank(self.db_path, batch_writes=True)
+
+    def tearDown(self):
+        self.memory.close()
+        super().tearDown()
+
+    def test_round_trip(self):
+        """Queued rows are all visible to the next read, with their data intact"""
+        for i in range(250):
+            self.memory.log_event("CAN_MESSAGE", "CP", f"frame {i}", {"seq": i})
+            self.memory.record_metric("current", float(i), "A", {"cp_id": "CP1"})
+        anomaly_id = self.memory.record_anomaly("CURRENT_SPIKE", "HIGH", "spike", {"peak": 100},
+                                                current_value=100.0, expected_value=32.0)
+
+        events = self.memory.get_events(limit=1000)
+        self.assertEqual(len(events), 250)
+        self.assertEqual(sorted(e["data"]["seq"] for e in events), list(range(250)))
+
+        stats = self.memory.get_metric_statistics("current")
+        self.assertEqual(stats["count"], 250)
+        self.assertEqual((stats["min"], stats["max"]), (0.0, 249.0))
+
+        anomalies = self.memory.get_anomalies()
+        self.assertEqual([a["id"] for a in anomalies], [anomaly_id])
+        self.assertEqual(anomalies[0]["pattern_data"], {"peak": 100})
+        self.assertEqual(anomalies[0]["deviation"], 68.0)
+
+    def test_sessions(self):
+        self.memory.start_session("S1")
+        self.memory.increment_session_anomaly_count("S1")
+        self.memory.end_session("S1", total_energy=1.5, avg_current=16.0)
+
+        session = self.memory.get_session("S1")
+        self.assertEqual(session["status"], "COMPLETED")
+        self.assertEqual(session["anomaly_count"], 1)
+        self.assertEqual(session["avg_current"], 16.0)
+
+    def test_blocking_writes_skip_flush_window(self):
+        """Calls that wait for their result must not wait out WRITE_FLUSH_SEC"""
+        self.memory.log_event("SYSTEM", "TEST", "queued")
+        calls = (
+            lambda: self.memory.start_session("S2"),
+            lambda: self.memory.record_anomaly("X", "LOW", "d", {}),
+            lambda: self.memory.record_metric("voltage", 230.0, "V", {"new": "series"}),
+            lambda: self.memory.get_events(),
+        )
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            self.assertLess(time.perf_counter() - start, WRITE_FLUSH_SEC / 2)
+
+    def test_writer_survives_failed_rows(self):
+        """A queued row that cannot be bound is dropped; later writes still go through"""
+        self.memory.record_metric("current", 2 ** 70, "A")  # OverflowError in executemany
+        self.memory.flush()
+        self.memory.record_metric("current", 16.0, "A")
+        self.memory.start_session("S3")
+
+        self.assertEqual(self.memory.get_metric_statistics("current")["count"], 1)
+        self.assertEqual(self.memory.get_session("S3")["status"], "ACTIVE")
+
+
+class TestPartitions(MemoryBankTestCase):
+    def test_event_ids_unique_across_days(self):
+        memory = MemoryBank(self.db_path)
+        now = time.time()
+        memory.log_events_bulk([(now - days * 86400, "E", "C", str(i), None)
+                                for days in range(3) for i in range(5)])
+        new_id = memory.log_event("E", "C", "today")
+
+        ids = [e["id"] for e in memory.get_events(limit=100)]
+        self.assertEqual(len(ids), 16)
+        self.assertEqual(len(set(ids)), 16)
+        self.assertIn(new_id, ids)
+        memory.close()
+
+    def test_statistics_after_compaction(self):
+        """Compacted past days give the same statistics as the raw samples"""
+        memory = MemoryBank(self.db_path)
+        now = time.time()
+        samples = [(now - days * 86400 - i * 7, "current", float(i % 50), "A", None)
+                   for days in range(3) for i in range(600)]
+        memory.record_metrics_bulk(samples)
+        windows = [timedelta(hours=1), timedelta(hours=30), None]
+        before = memory.get_metric_statistics_multi("current", windows)
+
+        self.assertGreater(memory.compact_metrics(), 0)
+        after = memory.get_metric_statistics_multi("current", windows)
+        for window in windows:
+            self.assertEqual(after[window]["count"], before[window]["count"])
+            self.assertAlmostEqual(after[window]["avg"], before[window]["avg"])
+        memory.close()
+
+    def test_get_metrics_merges_series_blocks(self):
+        """Newest compacted rows win even when another series' block ends later"""
+        memory = MemoryBank(self.db_path)
+        day = (datetime.now() - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        cp1 = [day + timedelta(hours=h) for h in (0, 1, 2, 3, 4, 5, 23)]
+        cp2 = [day + timedelta(hours=h) for h in (20, 21, 22)]
+        memory.record_metrics_bulk([(t.timestamp(), "current", 1.0, "A", {"cp_id": "CP1"}) for t in cp1] +
+                                   [(t.timestamp(), "current", 2.0, "A", {"cp_id": "CP2"}) for t in cp2])
+        self.assertEqual(memory.compact_metrics(), 10)
+
+        rows = memory.get_metrics("current", limit=3)
+        self.assertEqual([r["timestamp"] for r in rows],
+                         [t.timestamp() for t in (cp1[-1], cp2[2], cp2[1])])
+        self.assertEqual([r["metadata"]["cp_id"] for r in rows], ["CP1", "CP2", "CP2"])
+        memory.close()
+
+
+class TestConcurrentStartup(MemoryBankTestCase):
+    def _start_processes(self, n):
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_construct_and_log, args=(self.db_path, results))
+                 for _ in range(n)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(timeout=30)
+        return [results.get(timeout=5) for _ in procs]
+
+    def test_fresh_and_existing_database(self):
+        self.assertEqual(self._start_processes(6), ["ok"] * 6)
+        self.assertEqual(self._start_processes(4), ["ok"] * 4)
+
+        memory = MemoryBank(self.db_path)
+        self.assertEqual(len(memory.get_events(event_type="STARTUP", limit=100)), 10)
+        memory.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
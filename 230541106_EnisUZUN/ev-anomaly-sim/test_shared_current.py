@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+shared_current regression tests (seqlock snapshot)
+Run: python3 test_shared_current.py  (or python3 -m pytest test_shared_current.py)
+"""
+import os
+import unittest
+from multiprocessing import resource_tracker
+
+from shared_current import CurrentWriter, CurrentReader, _SEQ
+
+
+class TestSeqlock(unittest.TestCase):
+    def setUp(self):
+        self.name = f"ev_current_test_{os.getpid()}"
+        self.writer = CurrentWriter(self.name)
+        self.reader = CurrentReader(self.name)
+        # The reader drops the segment from this process' resource tracker (the
+        # writer normally lives in another process); re-register it for the writer
+        resource_tracker.register(self.writer.shm._name, "shared_memory")
+
+    def tearDown(self):
+        self.reader.buf = None
+        self.reader.shm.close()
+        self.writer.close()
+
+    def test_read_latest_sample(self):
+        self.writer.publish(1700000000.25, 32)
+        self.writer.publish(1700000000.35, 48)
+        seq, timestamp, current = self.reader.read()
+        self.assertEqual((timestamp, current), (1700000000.35, 48))
+        self.assertEqual(seq, 4)
+
+    def test_update_in_progress_is_not_returned(self):
+        self.writer.publish(1.0, 10)
+        _SEQ.pack_into(self.writer.buf, 0, self.writer.seq + 1)  # writer stopped mid-update
+        self.assertIsNone(self.reader.read(retries=5))
+
+    def test_new_writer_recovers_from_odd_sequence(self):
+        _SEQ.pack_into(self.writer.buf, 0, 7)
+        writer = CurrentWriter(self.name)
+        self.assertEqual(writer.seq, 8)
+        writer.publish(2.0, 20)
+        self.assertEqual(self.reader.read()[1:], (2.0, 20))
+        writer.close(unlink=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
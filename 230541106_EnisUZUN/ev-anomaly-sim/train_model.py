@@ -12,9 +12,19 @@ from sklearn.metrics import classification_report, confusion_matrix, accuracy_sc
 import pickle
 import os
 
+# Optional ONNX export (scaler + model as one graph) for live_detector.py
+try:
+    from sklearn.pipeline import Pipeline
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:
+    convert_sklearn = None
+
 CSV_FILE = "training_data.csv"
 MODEL_FILE = "anomaly_model.pkl"
 SCALER_FILE = "scaler.pkl"
+SCALER_PARAMS_FILE = "scaler_params.npz"
+ONNX_MODEL_FILE = "anomaly_model.onnx"
 
 def main():
     print("=" * 60)
@@ -113,9 +123,24 @@ def main():
         pickle.dump(model, f)
     with open(SCALER_FILE, 'wb') as f:
         pickle.dump(scaler, f)
+    # Plain arrays for live_detector.py: (x - mean) * inv_scale without unpickling sklearn
+    np.savez(SCALER_PARAMS_FILE, mean=scaler.mean_, inv_scale=1.0 / scaler.scale_)
     
     print(f"✅ Model saved to: {MODEL_FILE}")
-    print(f"✅ Scaler saved to: {SCALER_FILE}")
+    print(f"✅ Scaler saved to: {SCALER_FILE} (+ {SCALER_PARAMS_FILE})")
+    
+    if convert_sklearn is not None:
+        pipe = Pipeline([("scaler", scaler), ("model", model)])
+        onx = convert_sklearn(
+            pipe,
+            initial_types=[("features", FloatTensorType([None, len(feature_columns)]))],
+            options={id(model): {"zipmap": False}}  # probabilities as a plain tensor
+        )
+        with open(ONNX_MODEL_FILE, 'wb') as f:
+            f.write(onx.SerializeToString())
+        print(f"✅ ONNX model saved to: {ONNX_MODEL_FILE}")
+    else:
+        print("ℹ️  skl2onnx not installed, skipping ONNX export")
     print()
     
     # Save report